@@ -2,7 +2,8 @@ from flask import Flask, render_template, jsonify, send_from_directory, Response
 from src.database import Database
 from src.data_processing import DataProcessor
 from src.excel_operations import ExcelOperations
-from src.utils import handle_errors, allowed_file, validate_file_size, MAX_FILE_SIZE
+from src.query_service import QueryService
+from src.utils import handle_errors, allowed_file, validate_file_size, MAX_FILE_SIZE, OrjsonProvider
 from src.blueprints.data_generation import data_generation_bp
 from src.blueprints.data_import import data_import_bp
 
@@ -27,6 +28,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder='src/templates')
+# 使用 orjson 加速所有 jsonify 响应的序列化
+app.json = OrjsonProvider(app)
 
 # 初始化数据库和处理器
 db = None
@@ -41,6 +44,10 @@ try:
     time.sleep(5)
 
     db = Database()
+    # 启动时补齐性能索引（CREATE INDEX IF NOT EXISTS，已存在时开销可忽略）
+    db.ensure_performance_indexes()
+    # 启动时重建台账预聚合汇总表：迁移脚本或手工修改台账不经过应用写入路径，汇总表可能已过期
+    QueryService(db).refresh_ledger_rollups()
     data_processor = DataProcessor(db)
     excel_ops = ExcelOperations()
 
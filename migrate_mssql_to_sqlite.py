@@ -6,7 +6,9 @@
 import os
 import sys
 import logging
+import queue
 import sqlite3
+import threading
 import pandas as pd
 from datetime import datetime
 import json
@@ -27,6 +29,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 从MSSQL每批读取的行数
+FETCH_BATCH_SIZE = 10000
+# 读取线程与写入线程之间最多缓冲的批数（有界队列，限制内存占用）
+PIPELINE_QUEUE_SIZE = 4
+# SQLite IN 子句每块最多绑定的参数个数
+IN_CLAUSE_CHUNK_SIZE = 900
+
+# 由台账聚合得到的预聚合汇总表（与 src/query_service.py 中 LEDGER_ROLLUP_TABLES 一致）
+LEDGER_ROLLUP_TABLES = ('mv_household_stats', 'mv_month_stats')
+
+# 读取线程结束标记
+_END_OF_DATA = object()
+
 class DataMigrator:
     """数据迁移器"""
 
@@ -61,92 +76,127 @@ class DataMigrator:
             logger.error(f"数据库连接失败: {e}")
             return False
 
-    def get_mssql_table_data(self, table_name):
-        """从MSSQL获取表数据"""
+    def _produce_mssql_batches(self, table_name, batch_queue, stop_event):
+        """
+        读取线程：从MSSQL按批 fetchmany 表数据放入有界队列，与SQLite写入并行。
+        队列中依次为：列名列表、若干批按列转置的数据、结束标记；出错时放入异常对象。
+        """
+        def put(item):
+            # 写入端已停止时不再阻塞等待队列空位
+            while not stop_event.is_set():
+                try:
+                    batch_queue.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
         try:
             logger.info(f"从MSSQL读取表: {table_name}")
-
             with self.mssql_pool.get_cursor() as cursor:
-                # 获取数据
                 cursor.execute(f"SELECT * FROM [{table_name}]")
 
                 # 获取列名
                 column_names = [desc[0] for desc in cursor.description]
                 logger.info(f"表 {table_name} 的列: {column_names}")
-
-                # 获取数据
-                rows = cursor.fetchall()
-
-                if not rows:
-                    logger.warning(f"表 {table_name} 无数据")
-                    return pd.DataFrame()
-
-                # 将pyodbc.Row对象转换为列表
-                data = [list(row) for row in rows]
-
-                # 转换为DataFrame
-                df = pd.DataFrame(data, columns=column_names)
-                logger.info(f"从 {table_name} 读取了 {len(df)} 条记录，{len(df.columns)} 列")
-
-                return df
-
+                if not put(column_names):
+                    return
+
+                while True:
+                    rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                    if not rows:
+                        break
+                    # 按列转置后再交给 DataFrame，按列推断类型，不再为每行构造一个列表
+                    if not put(list(zip(*rows))):
+                        return
+            put(_END_OF_DATA)
         except Exception as e:
             logger.error(f"读取MSSQL表 {table_name} 失败: {e}")
             import traceback
             logger.error(traceback.format_exc())
-            return None
+            put(e)
 
     def clear_sqlite_table(self, table_name):
-        """清空SQLite表数据"""
+        """清空SQLite表数据（不提交，与随后的批量写入处于同一事务，由调用方统一提交或回滚）"""
         try:
             cursor = self.sqlite_conn.cursor()
             cursor.execute(f"DELETE FROM [{table_name}]")
-            self.sqlite_conn.commit()
             logger.info(f"已清空SQLite表: {table_name}")
         except Exception as e:
             logger.error(f"清空SQLite表 {table_name} 失败: {e}")
             raise
 
-    def insert_sqlite_data(self, table_name, df):
-        """将数据插入SQLite表"""
+    def get_sqlite_table_info(self, table_name):
+        """获取SQLite表的列名列表和主键列（无主键时为None）"""
+        cursor = self.sqlite_conn.cursor()
+        columns = []
+        pk_col = None
+        for col_info in cursor.execute(f"PRAGMA table_info([{table_name}])").fetchall():
+            # PRAGMA table_info 返回列：cid, name, type, notnull, dflt_value, pk
+            columns.append(col_info[1])
+            if col_info[5] == 1 and pk_col is None:
+                pk_col = col_info[1]
+        return columns, pk_col
+
+    def insert_sqlite_data(self, table_name, df, table_info):
+        """将一批数据插入SQLite表（不提交，由调用方在整表写入完成后统一提交）"""
         try:
-            logger.info(f"向SQLite表 {table_name} 插入 {len(df)} 条记录")
-
-            # 获取SQLite表结构
-            cursor = self.sqlite_conn.cursor()
-            cursor.execute(f"PRAGMA table_info([{table_name}])")
-            sqlite_columns = [col[1] for col in cursor.fetchall()]
+            sqlite_columns, pk_col = table_info
 
             # 只保留SQLite表中存在的列
             df_filtered = df[[col for col in df.columns if col in sqlite_columns]].copy()
 
-            # 如果目标表有主键列，先按主键去重，避免UNIQUE冲突
-            pk_col = None
-            for col_info in cursor.execute(f"PRAGMA table_info([{table_name}])").fetchall():
-                # PRAGMA table_info 返回列：cid, name, type, notnull, dflt_value, pk
-                if col_info[5] == 1:
-                    pk_col = col_info[1]
-                    break
+            # 如果目标表有主键列，先按主键去重，避免UNIQUE冲突；
+            # 与之前批次重复的主键以后出现的记录为准，先删除已写入的同主键记录
+            replaced = 0
             if pk_col and pk_col in df_filtered.columns:
                 before = len(df_filtered)
                 df_filtered = df_filtered.drop_duplicates(subset=[pk_col], keep='last')
-                logger.info(f"检测到主键列 {pk_col}，已按主键去重：{before} -> {len(df_filtered)} 条")
+                if len(df_filtered) < before:
+                    # 每批都可能触发，降为调试级别并延迟格式化；表级结果由 migrate_table 汇总输出
+                    logger.debug("检测到主键列 %s，已按主键去重：%d -> %d 条", pk_col, before, len(df_filtered))
+                cursor = self.sqlite_conn.cursor()
+                keys = df_filtered[pk_col].tolist()
+                for i in range(0, len(keys), IN_CLAUSE_CHUNK_SIZE):
+                    chunk = keys[i:i + IN_CLAUSE_CHUNK_SIZE]
+                    cursor.execute(
+                        f"DELETE FROM [{table_name}] WHERE [{pk_col}] IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                    replaced += cursor.rowcount
 
             # 处理数据类型转换
             df_filtered = self.convert_data_types(df_filtered, table_name)
 
-            # 插入数据
-            df_filtered.to_sql(table_name, self.sqlite_conn, if_exists='append', index=False)
-            self.sqlite_conn.commit()
+            # 插入数据：用 executemany 写入当前事务（to_sql 会自行提交，无法与清空操作一起回滚）
+            columns = ', '.join(f"[{col}]" for col in df_filtered.columns)
+            placeholders = ', '.join('?' * len(df_filtered.columns))
+            self.sqlite_conn.executemany(
+                f"INSERT INTO [{table_name}] ({columns}) VALUES ({placeholders})",
+                self._to_sqlite_rows(df_filtered)
+            )
 
-            logger.info(f"成功插入 {len(df_filtered)} 条记录到 {table_name}")
-            return len(df_filtered)
+            # 返回本批新增的记录数（覆盖之前批次同主键记录的不重复计数）
+            return len(df_filtered) - replaced
 
         except Exception as e:
             logger.error(f"插入数据到SQLite表 {table_name} 失败: {e}")
-            self.sqlite_conn.rollback()
             raise
 
+    @staticmethod
+    def _to_sqlite_rows(df):
+        """
+        将 DataFrame 转为 executemany 参数行，写入结果与 to_sql 一致：
+        缺失值写为 NULL，日期时间写为 'YYYY-MM-DD HH:MM:SS' 文本，numpy 数值转为 Python 数值
+        """
+        columns = []
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                series = series.map(lambda v: None if pd.isna(v) else v.to_pydatetime().isoformat(' '))
+            series = series.astype(object)
+            columns.append(series.where(series.notna(), None).tolist())
+        return list(zip(*columns))
+
     def convert_data_types(self, df, table_name):
         """转换数据类型以适配SQLite"""
         try:
@@ -265,29 +315,66 @@ class DataMigrator:
             raise
             raise
 
+    def drop_ledger_rollups(self):
+        """删除台账预聚合汇总表：迁移后汇总表已与台账不一致，统计接口回退到实时查询，应用启动时重建"""
+        cur = self.sqlite_conn.cursor()
+        for table in LEDGER_ROLLUP_TABLES:
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+        self.sqlite_conn.commit()
+        logger.info("已删除台账预聚合汇总表，应用启动时重建")
+
     def migrate_table(self, table_name):
-        """迁移单个表"""
+        """迁移单个表：读取线程按批读取MSSQL，当前线程同时将已读到的批次写入SQLite"""
+        batch_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stop_event = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_mssql_batches, args=(table_name, batch_queue, stop_event),
+            name=f'migrate-read-{table_name}', daemon=True
+        )
+        count = 0
+        cleared = False
+        logger.info(f"开始迁移表: {table_name}")
+        producer.start()
         try:
-            logger.info(f"开始迁移表: {table_name}")
-
-            # 从MSSQL读取数据
-            df = self.get_mssql_table_data(table_name)
-            if df is None or df.empty:
-                logger.warning(f"表 {table_name} 无数据或读取失败，跳过迁移")
+            column_names = batch_queue.get()
+            if isinstance(column_names, Exception):
+                logger.warning(f"表 {table_name} 读取失败，跳过迁移")
                 return 0
+            table_info = self.get_sqlite_table_info(table_name)
 
-            # 清空SQLite表
-            self.clear_sqlite_table(table_name)
-
-            # 插入数据到SQLite
-            count = self.insert_sqlite_data(table_name, df)
+            while True:
+                item = batch_queue.get()
+                if item is _END_OF_DATA:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                # 收到第一批数据后再清空SQLite表（源表无数据时保留原数据）；
+                # 清空与各批写入处于同一事务，读取完成后一次提交，中途失败时整体回滚
+                if not cleared:
+                    self.clear_sqlite_table(table_name)
+                    cleared = True
+                df = pd.DataFrame({name: list(values) for name, values in zip(column_names, item)})
+                count += self.insert_sqlite_data(table_name, df, table_info)
+
+            if not cleared:
+                logger.warning(f"表 {table_name} 无数据，跳过迁移")
+                return 0
 
+            self.sqlite_conn.commit()
             logger.info(f"表 {table_name} 迁移完成，共迁移 {count} 条记录")
             return count
 
         except Exception as e:
-            logger.error(f"迁移表 {table_name} 失败: {e}")
+            if cleared:
+                self.sqlite_conn.rollback()
+                logger.error(f"迁移表 {table_name} 失败，已回滚，SQLite表保留原数据: {e}")
+            else:
+                logger.error(f"迁移表 {table_name} 失败: {e}")
             raise
+        finally:
+            stop_event.set()
+            producer.join()
 
     def migrate_all_tables(self):
         """迁移所有表，并重建SQLite侧视图所需基础数据"""
@@ -312,6 +399,11 @@ class DataMigrator:
                 logger.error(f"创建/校验视图 v_town_village_list 失败: {e}")
                 # 不终止整体迁移
 
+            try:
+                self.drop_ledger_rollups()
+            except Exception as e:
+                logger.error(f"删除台账预聚合汇总表失败: {e}")
+
             logger.info(f"数据迁移完成！总共迁移了 {total_records} 条记录")
             return total_records
 
@@ -58,6 +58,10 @@ class DatabaseOptimizer:
             
             # 覆盖索引 - 包含常用字段
             ("idx_台账_覆盖_统计", "调查点台账合并", "(year, month, type, code, money, hudm)"),
+            ("idx_台账_覆盖_分户区间", "调查点台账合并", "(hudm, year, month, type, code, money)"),
+
+            # 户名单村代码表达式索引 - 优化区域分析按村代码取户
+            ("idx_户名单_村代码", "调查点户名单", "(SUBSTR(户代码, 1, 12))"),
         ]
         
         for idx_name, table_name, columns in indexes:
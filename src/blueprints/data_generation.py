@@ -12,6 +12,7 @@ import tempfile
 import shutil
 import time
 import threading
+from src.query_service import QueryService
 # from src.error_handler import with_error_handling  # 已删除
 
 # 创建蓝图
@@ -127,7 +128,15 @@ SET type = (
 WHERE EXISTS (
     SELECT 1 FROM 调查品种编码 c
     WHERE c.帐目编码 = 调查点台账合并.code
+)
+AND type IS NOT (
+    SELECT 收支类别 FROM 调查品种编码 c
+    WHERE c.帐目编码 = 调查点台账合并.code
 )''')
+                type_updated = cursor.rowcount
+            # 收支类型有变化时重建按收支类型聚合的统计汇总表（同时使按数据版本缓存的统计与画像结果失效）
+            if type_updated > 0:
+                QueryService(db).refresh_ledger_rollups()
 
             # 使用新的电子台账生成器
             from src.electronic_ledger_generator import ElectronicLedgerGenerator
@@ -212,8 +221,6 @@ WHERE EXISTS (
     
     def _generate_all_towns_ledger(year, month, village, task_id=None):
         """批量生成所有乡镇的电子台账"""
-        from src.query_service import QueryService
-
         try:
             # 获取数据库实例和查询服务
             # 使用全局变量 db（在蓝图初始化时设置）
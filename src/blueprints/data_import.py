@@ -13,6 +13,9 @@ import pandas as pd
 import re
 from datetime import datetime
 
+from src.query_service import QueryService, bump_data_version
+from src.blueprints.statistics import invalidate_town_village_mapping
+
 # 创建蓝图
 data_import_bp = Blueprint('data_import', __name__)
 logger = logging.getLogger(__name__)
@@ -25,6 +28,9 @@ allowed_file = None
 validate_file_size = None
 app_config = None
 
+# IN 子句每块最多绑定的参数个数（低于 SQLite 默认变量上限 999）
+IN_CLAUSE_CHUNK_SIZE = 900
+
 def init_blueprint(database, excel_operations, error_handler, file_validator, size_validator, config):
     """初始化蓝图依赖"""
     global db, excel_ops, handle_errors, allowed_file, validate_file_size, app_config
@@ -97,7 +103,7 @@ def _process_uploaded_file(file, operation_name, allowed_extensions, read_func):
         file.save(file_path)
         logger.info(f"文件保存成功: {file_path}")
 
-        # 6. 使用回调函数读取和处理文件内容
+        # 6. 使用回调函数读取和处理文件内容（只解析一次，DataFrame 直接交给调用方）
         df = read_func(file_path)
         return df, None, file_path
 
@@ -278,9 +284,17 @@ def import_national_data():
                 # 插入数据到调查点台账合并表（改为：从临时表 SELECT 到 DataFrame，在 Python 端预处理并 executemany 插入）
                 logger.info("开始插入国家点数据到主表（Python 端预处理）")
 
-                # 1) 从临时表读取有效记录
+                # 1) 从临时表读取有效记录；户代码、品种编码是否存在由数据库按索引判定（半连接），
+                #    不再把户名单和编码表整表读入 Python 做集合比对
+                #    hudm 规则同下文：SID 前12位 + 末5位的前3位（不足5位只取前12位）
                 select_sql = """
-                SELECT [SID], [编码], [数量], [金额], [记账说明], [人码], [人代码], [年], [月], [创建时间], [品名]
+                SELECT [SID], [编码], [数量], [金额], [记账说明], [人码], [人代码], [年], [月], [创建时间], [品名],
+                       EXISTS (
+                           SELECT 1 FROM 调查点户名单 h
+                           WHERE h.户代码 = SUBSTR(TRIM([SID]), 1, 12)
+                               || CASE WHEN LENGTH(TRIM([SID])) >= 5 THEN SUBSTR(TRIM([SID]), -5, 3) ELSE '' END
+                       ) AS hudm_known,
+                       EXISTS (SELECT 1 FROM 调查品种编码 c WHERE c.帐目编码 = TRIM([编码])) AS code_known
                 FROM 国家点待导入
                 WHERE ([SID] IS NOT NULL AND TRIM([SID]) <> '')
                   AND ([创建时间] IS NOT NULL AND TRIM([创建时间]) <> '')
@@ -288,15 +302,24 @@ def import_national_data():
                   AND ([品名] IS NOT NULL AND TRIM([品名]) <> '')
                   AND (([人码] IS NOT NULL AND TRIM([人码]) <> '') OR ([人代码] IS NOT NULL AND TRIM([人代码]) <> ''))
                 """
-                rows = db.execute_query_safe(select_sql)
-
-                if not rows:
+                # 按批流式读取（普通元组行），每批直接转为 DataFrame，
+                # 不再先 fetchall 全部行、再逐行转 dict 后构造 DataFrame
+                select_columns = [
+                    'SID', '编码', '数量', '金额', '记账说明', '人码', '人代码', '年', '月', '创建时间', '品名',
+                    'hudm_known', 'code_known'
+                ]
+                frames = [
+                    pd.DataFrame(batch, columns=select_columns)
+                    for batch in db.execute_query_stream(select_sql)
+                ]
+
+                if not frames:
                     logger.info("没有符合条件的记录可插入主表。")
                     inserted_count = 0
                 else:
-                    # 2) 转为 DataFrame 并进行字段预处理
-                    records = [dict(r) for r in rows]
-                    df_temp = pd.DataFrame.from_records(records)
+                    # 2) 合并各批并进行字段预处理
+                    df_temp = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+                    del frames
 
                     # 统一字符串类型并填充缺失
                     for col in ['SID','编码','数量','金额','记账说明','人码','人代码','年','月','创建时间','品名']:
@@ -304,27 +327,18 @@ def import_national_data():
                             df_temp[col] = ''
                         df_temp[col] = df_temp[col].astype(str).fillna('').str.strip()
 
-                    # 生成 hudm: 前12位 + (末5位的前3位)
-                    def build_hudm(sid: str) -> str:
-                        if not sid:
-                            return ''
-                        head12 = sid[:12]
-                        tail5_first3 = sid[-5:][:3] if len(sid) >= 5 else ''
-                        return head12 + tail5_first3
-
-                    df_temp['hudm'] = df_temp['SID'].apply(build_hudm)
+                    # 以下字段均按列向量化生成，不再逐行 apply
+                    # 生成 hudm: 前12位 + (末5位的前3位)，不足5位的 SID 只取前12位
+                    sid = df_temp['SID']
+                    df_temp['hudm'] = sid.str[:12] + sid.str[-5:].str[:3].where(sid.str.len() >= 5, '')
 
                     # 选择 person 字段：人码 或 人代码
-                    df_temp['person'] = df_temp.apply(lambda r: r['人码'] if r['人码'] else (r['人代码'] if r['人代码'] else ''), axis=1)
+                    df_temp['person'] = df_temp['人码'].where(df_temp['人码'] != '', df_temp['人代码'])
 
                     # 解析年份与月份（优先使用 年/月，否则从 创建时间 推断）
                     ts = pd.to_datetime(df_temp['创建时间'], errors='coerce')
-                    df_temp['year'] = df_temp.apply(
-                        lambda r: r['年'] if r['年'] else (str(ts[r.name].year) if pd.notna(ts[r.name]) else ''), axis=1
-                    )
-                    df_temp['month'] = df_temp.apply(
-                        lambda r: r['月'] if r['月'] else (str(ts[r.name].month).zfill(2) if pd.notna(ts[r.name]) else ''), axis=1
-                    )
+                    df_temp['year'] = df_temp['年'].where(df_temp['年'] != '', ts.dt.strftime('%Y').fillna(''))
+                    df_temp['month'] = df_temp['月'].where(df_temp['月'] != '', ts.dt.strftime('%m').fillna(''))
 
                     # 生成 z_guid、type、id、固定值列
                     import uuid as _uuid
@@ -341,24 +355,11 @@ def import_national_data():
                     # 外键预检查与修正：
                     #  - 若 hudm 不在 调查点户名单，则跳过该记录，避免违反外键(hudm -> 户代码)
                     #  - 若 code 不在 调查品种编码，则将 code 置为 NULL（允许为空，不违反外键）
-                    try:
-                        rows_h = db.execute_query_safe("SELECT 户代码 FROM 调查点户名单")
-                        allowed_hudm = {str(r[0]).strip() for r in rows_h if r and r[0] is not None}
-                    except Exception as e:
-                        logger.warning(f"加载户名单失败，将视为无可用户代码集合: {e}")
-                        allowed_hudm = set()
-                    try:
-                        rows_c = db.execute_query_safe("SELECT 帐目编码 FROM 调查品种编码")
-                        allowed_codes = {str(r[0]).strip() for r in rows_c if r and r[0] is not None}
-                    except Exception as e:
-                        logger.warning(f"加载品种编码失败，将视为无可用编码集合: {e}")
-                        allowed_codes = set()
-
                     pre_cnt = len(df_temp)
                     # 置空不在编码表的 code（保留原记录用于金额统计等）
-                    df_temp['code_fixed'] = df_temp['编码'].apply(lambda x: x if x in allowed_codes else None)
+                    df_temp['code_fixed'] = df_temp['编码'].astype(object).where(df_temp['code_known'] == 1, None)
                     # 过滤掉 hudm 未在户名单中的记录
-                    df_temp = df_temp[df_temp['hudm'].isin(allowed_hudm)].copy()
+                    df_temp = df_temp[df_temp['hudm_known'] == 1].copy()
                     skipped_fk_households = pre_cnt - len(df_temp)
                     # 统计编码被置空的记录数（原编码非空但不在编码表）
                     try:
@@ -376,13 +377,12 @@ def import_national_data():
                         ") VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
                     )
 
-                    values = [
-                        (
-                            r['hudm'], r.get('code_fixed'), r['数量'], r['金额'], r['记账说明'], r['person'], r['year'], r['month'],
-                            r['z_guid'], r['创建时间'], r['type'], r['id'], r['type_name'], r['unit_name'], r['ybm'], r['ybz'], r['wton'], r['ntow']
-                        )
-                        for _, r in df_temp.iterrows()
+                    # 按列取值后 zip 成参数元组，避免 iterrows 逐行构造 Series
+                    insert_columns = [
+                        'hudm', 'code_fixed', '数量', '金额', '记账说明', 'person', 'year', 'month',
+                        'z_guid', '创建时间', 'type', 'id', 'type_name', 'unit_name', 'ybm', 'ybz', 'wton', 'ntow'
                     ]
+                    values = list(zip(*(df_temp[col].tolist() for col in insert_columns)))
 
                     with db.pool.get_cursor() as cursor:
                         cursor.executemany(insert_sql, values)
@@ -416,6 +416,10 @@ def import_national_data():
                             type_updated_count = cursor.rowcount
                             logger.info(f"收支类别自动填充完成，共更新 {type_updated_count} 条记录的type字段")
 
+                    # 台账数据已变更，重建统计预聚合汇总表
+                    if inserted_count > 0:
+                        QueryService(db).refresh_ledger_rollups()
+
             # 构建返回消息
             summary_message = f"国家点数据导入完成！\n"
             summary_message += f"• 导入到临时表：{temp_count} 条\n"
@@ -672,69 +676,85 @@ def import_household_list():
 
             logger.info(f"开始处理 {total_rows} 条调查点户名单记录（有效前12位集合大小: {len(allowed_prefixes)}）")
 
-            # 逐行处理数据，使用UPSERT操作
-            with db.pool.get_cursor() as cursor:
-                for index, row in df.iterrows():
-                    try:
-                        户代码 = str(row['户代码']).strip()
-                        户主姓名 = str(row['户主姓名']).strip()
-                        人数 = int(row['人数']) if pd.notna(row['人数']) else 1
-                        所在乡镇街道 = str(row['所在乡镇街道']).strip() if pd.notna(row['所在乡镇街道']) else ''
-                        村居名称 = str(row['村居名称']).strip() if pd.notna(row['村居名称']) else ''
-
-                        # 验证必需字段
-                        if not 户代码 or not 户主姓名:
-                            error_count += 1
-                            error_details.append(f"第{index+2}行: 户代码或户主姓名为空")
-                            continue
-
-                        # 过滤：户代码前12位必须存在于“调查点村名单”
-                        前12位 = 户代码[:12]
-                        if (len(前12位) < 12) or (前12位 not in allowed_prefixes):
-                            skipped_count += 1
-                            # 可选：记录少量样本便于排查
-                            if skipped_count <= 5:
-                                error_details.append(f"第{index+2}行已跳过：户代码前12位 {前12位} 不在调查点村名单中")
-                            continue
-
-                        # 检查记录是否已存在
-                        check_sql = "SELECT COUNT(*) FROM 调查点户名单 WHERE 户代码 = ?"
-                        cursor.execute(check_sql, (户代码,))
-                        exists = cursor.fetchone()[0] > 0
-
-                        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        # 支持从Excel读取的时间字段（若提供）
-                        提供创建时间 = ('创建时间' in df.columns and pd.notna(row.get('创建时间')))
-                        提供更新时间 = ('更新时间' in df.columns and pd.notna(row.get('更新时间')))
-                        创建时间值 = str(row.get('创建时间')) if 提供创建时间 else current_time
-                        更新时间值 = str(row.get('更新时间')) if 提供更新时间 else current_time
-
-                        if exists:
-                            # 更新现有记录（不修改创建时间）
-                            update_sql = """
-                            UPDATE 调查点户名单
-                            SET 户主姓名 = ?, 人数 = ?, 所在乡镇街道 = ?, 村居名称 = ?, 更新时间 = ?
-                            WHERE 户代码 = ?
-                            """
-                            cursor.execute(update_sql, (户主姓名, 人数, 所在乡镇街道, 村居名称, 更新时间值, 户代码))
-                            updated_count += 1
-                            logger.debug(f"更新户代码 {户代码} 的记录")
-                        else:
-                            # 插入新记录（若Excel提供则使用提供的时间）
-                            insert_sql = """
-                            INSERT INTO 调查点户名单 (户代码, 户主姓名, 人数, 所在乡镇街道, 村居名称, 创建时间, 更新时间)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """
-                            cursor.execute(insert_sql, (户代码, 户主姓名, 人数, 所在乡镇街道, 村居名称, 创建时间值, 更新时间值))
-                            new_count += 1
-                            logger.debug(f"插入新户代码 {户代码} 的记录")
-
-                    except Exception as e:
+            # 逐行校验并整理参数；数据库写入在校验完成后按新增/更新两类集中批量执行
+            prepared_rows = []
+            # 与行无关的判断在循环外求值一次：是否提供时间列、缺省时间戳
+            has_create_time = '创建时间' in df.columns
+            has_update_time = '更新时间' in df.columns
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for index, row in df.iterrows():
+                try:
+                    户代码 = str(row['户代码']).strip()
+                    户主姓名 = str(row['户主姓名']).strip()
+                    人数 = int(row['人数']) if pd.notna(row['人数']) else 1
+                    所在乡镇街道 = str(row['所在乡镇街道']).strip() if pd.notna(row['所在乡镇街道']) else ''
+                    村居名称 = str(row['村居名称']).strip() if pd.notna(row['村居名称']) else ''
+
+                    # 验证必需字段
+                    if not 户代码 or not 户主姓名:
                         error_count += 1
-                        error_details.append(f"第{index+2}行处理失败: {str(e)}")
-                        logger.warning(f"处理第{index+2}行数据失败: {str(e)}")
+                        error_details.append(f"第{index+2}行: 户代码或户主姓名为空")
+                        continue
+
+                    # 过滤：户代码前12位必须存在于“调查点村名单”
+                    前12位 = 户代码[:12]
+                    if (len(前12位) < 12) or (前12位 not in allowed_prefixes):
+                        skipped_count += 1
+                        # 可选：记录少量样本便于排查
+                        if skipped_count <= 5:
+                            error_details.append(f"第{index+2}行已跳过：户代码前12位 {前12位} 不在调查点村名单中")
                         continue
 
+                    # 支持从Excel读取的时间字段（若提供）
+                    提供创建时间 = has_create_time and pd.notna(row.get('创建时间'))
+                    提供更新时间 = has_update_time and pd.notna(row.get('更新时间'))
+                    创建时间值 = str(row.get('创建时间')) if 提供创建时间 else current_time
+                    更新时间值 = str(row.get('更新时间')) if 提供更新时间 else current_time
+
+                    prepared_rows.append((户代码, 户主姓名, 人数, 所在乡镇街道, 村居名称, 创建时间值, 更新时间值))
+
+                except Exception as e:
+                    # 逐行失败只计数并保留详情，失败总数在导入完成日志中汇总输出
+                    error_count += 1
+                    error_details.append(f"第{index+2}行处理失败: {str(e)}")
+                    continue
+
+            with db.pool.get_cursor() as cursor:
+                # 已存在的户代码按块一次查出，不再逐行 SELECT COUNT(*) 探测
+                codes = list(dict.fromkeys(r[0] for r in prepared_rows))
+                existing_codes = set()
+                for i in range(0, len(codes), IN_CLAUSE_CHUNK_SIZE):
+                    chunk = codes[i:i + IN_CLAUSE_CHUNK_SIZE]
+                    cursor.execute(
+                        f"SELECT 户代码 FROM 调查点户名单 WHERE 户代码 IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                    existing_codes.update(r[0] for r in cursor.fetchall())
+
+                # 已存在的户更新（不修改创建时间），其余新增（若Excel提供则使用提供的时间）；
+                # 同一文件中重复出现的户代码，首次按新增处理，之后按更新处理
+                update_params = []
+                insert_params = []
+                for 户代码, 户主姓名, 人数, 所在乡镇街道, 村居名称, 创建时间值, 更新时间值 in prepared_rows:
+                    if 户代码 in existing_codes:
+                        update_params.append((户主姓名, 人数, 所在乡镇街道, 村居名称, 更新时间值, 户代码))
+                    else:
+                        insert_params.append((户代码, 户主姓名, 人数, 所在乡镇街道, 村居名称, 创建时间值, 更新时间值))
+                        existing_codes.add(户代码)
+
+                if insert_params:
+                    cursor.executemany("""
+                    INSERT INTO 调查点户名单 (户代码, 户主姓名, 人数, 所在乡镇街道, 村居名称, 创建时间, 更新时间)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, insert_params)
+                if update_params:
+                    cursor.executemany("""
+                    UPDATE 调查点户名单
+                    SET 户主姓名 = ?, 人数 = ?, 所在乡镇街道 = ?, 村居名称 = ?, 更新时间 = ?
+                    WHERE 户代码 = ?
+                    """, update_params)
+                new_count = len(insert_params)
+                updated_count = len(update_params)
+
             # 构建返回消息
             summary_message = f"调查点户名单导入完成！\n"
             summary_message += f"• 总处理记录数：{total_rows} 条\n"
@@ -750,6 +770,9 @@ def import_household_list():
                     summary_message += f"  - 还有 {len(error_details) - 5} 条未显示\n"
 
             logger.info(f"调查点户名单导入完成 - 新增: {new_count}, 更新: {updated_count}, 跳过: {skipped_count}, 错误: {error_count}")
+            # 分户统计按户名单关联户主姓名，户名单变更后统计结果缓存一并失效
+            if new_count or updated_count:
+                bump_data_version()
             return summary_message
 
         except Exception as e:
@@ -766,6 +789,16 @@ def import_household_list():
 # 参照“调查点户名单管理”的实现风格
 # =============================
 
+# 村名单导入时每处理多少行提交一次事务
+VILLAGE_IMPORT_COMMIT_CHUNK = 1000
+# 导入结果中最多展示的错误详情条数
+ERROR_DETAIL_LIMIT = 5
+
+def _append_error_detail(error_details, detail):
+    """记录错误详情：只保留前 ERROR_DETAIL_LIMIT 条用于展示，其余不再逐条写日志，由调用方在结束时汇总记录总数"""
+    if len(error_details) < ERROR_DETAIL_LIMIT:
+        error_details.append(detail)
+
 def _read_village_list_excel(file_path):
     """读取调查点村名单Excel文件，并进行基础清洗与校验"""
     try:
@@ -778,18 +811,15 @@ def _read_village_list_excel(file_path):
         if missing_columns:
             raise ValueError(f"Excel文件缺少必需的列: {missing_columns}")
 
-        # 清理关键字段
-        df['户代码前12位'] = df['户代码前12位'].astype(str).str.strip()
-        df['所在乡镇街道'] = df['所在乡镇街道'].astype(str).fillna('').str.strip()
-        df['村居名称'] = df['村居名称'].astype(str).fillna('').str.strip()
-
         # 可选字段
         optional_text_cols = ['调查点类型', '调查员姓名', '调查员电话', '城乡属性']
         for col in optional_text_cols:
             if col not in df.columns:
                 df[col] = ''
-            else:
-                df[col] = df[col].astype(str).fillna('').str.strip()
+
+        # 文本字段统一清理：先填充空值再转字符串（避免 NaN 被转成 "nan"），整块一次完成
+        text_cols = required_columns + optional_text_cols
+        df[text_cols] = df[text_cols].fillna('').astype('string').apply(lambda s: s.str.strip())
 
         # 数量列（可选，数值）
         if '数量' not in df.columns:
@@ -797,12 +827,13 @@ def _read_village_list_excel(file_path):
         else:
             df['数量'] = pd.to_numeric(df['数量'], errors='coerce')
 
-        # 删除关键字段为空的行
-        df = df.dropna(subset=['户代码前12位'])
-        df = df[df['户代码前12位'].str.len() > 0]
+        # 删除关键字段为空的行并去重（以“户代码前12位”为主键，重复时以表中靠后的记录为准）
+        mask = df['户代码前12位'].notna() & df['户代码前12位'].str.len().gt(0)
+        df = df.loc[mask].drop_duplicates(subset=['户代码前12位'], keep='last')
 
-        # 去重（以“户代码前12位”为主键）
-        df = df.drop_duplicates(subset=['户代码前12位'])
+        # 低基数文本列转换为分类类型，减少内存占用并加速后续字符串处理
+        for col in ['所在乡镇街道', '调查点类型', '城乡属性']:
+            df[col] = df[col].astype('category')
 
         logger.info(f"调查点村名单数据清理完成，有效数据 {len(df)} 行")
         return df
@@ -867,6 +898,9 @@ def import_village_list():
         )
         if error:
             return error[0], error[1]
+        # 已提交的有效记录数及其中最后一条对应的Excel行号（跳过/出错的行不计入记录数）
+        committed_count = 0
+        committed_excel_row = None
         try:
             if df.empty:
                 return "Excel文件中没有有效数据", 400
@@ -877,52 +911,85 @@ def import_village_list():
             error_count = 0
             error_details = []
 
-            with db.pool.get_cursor() as cursor:
-                for idx, row in df.iterrows():
-                    try:
-                        户代码前12位 = str(row['户代码前12位']).strip()
-                        所在乡镇街道 = str(row['所在乡镇街道']).strip() if pd.notna(row['所在乡镇街道']) else ''
-                        村居名称 = str(row['村居名称']).strip() if pd.notna(row['村居名称']) else ''
-                        调查点类型 = str(row['调查点类型']).strip() if pd.notna(row['调查点类型']) else ''
-                        调查员姓名 = str(row['调查员姓名']).strip() if pd.notna(row['调查员姓名']) else ''
-                        调查员电话 = str(row['调查员电话']).strip() if pd.notna(row['调查员电话']) else ''
-                        城乡属性 = str(row['城乡属性']).strip() if pd.notna(row['城乡属性']) else ''
-                        数量 = row['数量'] if pd.notna(row['数量']) else None
-
-                        if not 户代码前12位:
-                            error_count += 1
-                            error_details.append(f"第{idx+2}行: 户代码前12位为空")
-                            continue
-                        if not 所在乡镇街道 or not 村居名称:
-                            error_count += 1
-                            error_details.append(f"第{idx+2}行: 所在乡镇街道或村居名称为空")
-                            continue
-
-                        # 是否存在
-                        check_sql = "SELECT COUNT(*) FROM 调查点村名单 WHERE 户代码前12位 = ?"
-                        cursor.execute(check_sql, (户代码前12位,))
-                        exists = cursor.fetchone()[0] > 0
-
-                        if exists:
-                            update_sql = """
-                            UPDATE 调查点村名单
-                            SET 数量 = ?, 调查点类型 = ?, 所在乡镇街道 = ?, 村居名称 = ?, 调查员姓名 = ?, 调查员电话 = ?, 城乡属性 = ?
-                            WHERE 户代码前12位 = ?
-                            """
-                            cursor.execute(update_sql, (数量, 调查点类型, 所在乡镇街道, 村居名称, 调查员姓名, 调查员电话, 城乡属性, 户代码前12位))
-                            updated_count += 1
-                        else:
-                            insert_sql = """
-                            INSERT INTO 调查点村名单 (户代码前12位, 数量, 调查点类型, 所在乡镇街道, 村居名称, 调查员姓名, 调查员电话, 城乡属性)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                            """
-                            cursor.execute(insert_sql, (户代码前12位, 数量, 调查点类型, 所在乡镇街道, 村居名称, 调查员姓名, 调查员电话, 城乡属性))
-                            new_count += 1
-                    except Exception as e:
+            # 按列取出NumPy数组后逐行zip，避免 iterrows 为每行构造 Series 的开销
+            row_columns = ['户代码前12位', '数量', '调查点类型', '所在乡镇街道', '村居名称', '调查员姓名', '调查员电话', '城乡属性']
+            column_arrays = [df[c].to_numpy() for c in row_columns]
+
+            # 逐行校验并整理参数；数据库写入在校验完成后按新增/更新两类批量执行
+            prepared_rows = []
+            # 与 prepared_rows 一一对应的Excel行号（表头占第1行）
+            source_excel_rows = []
+            for idx, *row in zip(df.index, *column_arrays):
+                try:
+                    户代码前12位, 数量, 调查点类型, 所在乡镇街道, 村居名称, 调查员姓名, 调查员电话, 城乡属性 = row
+                    户代码前12位 = str(户代码前12位).strip()
+                    所在乡镇街道 = str(所在乡镇街道).strip() if pd.notna(所在乡镇街道) else ''
+                    村居名称 = str(村居名称).strip() if pd.notna(村居名称) else ''
+                    调查点类型 = str(调查点类型).strip() if pd.notna(调查点类型) else ''
+                    调查员姓名 = str(调查员姓名).strip() if pd.notna(调查员姓名) else ''
+                    调查员电话 = str(调查员电话).strip() if pd.notna(调查员电话) else ''
+                    城乡属性 = str(城乡属性).strip() if pd.notna(城乡属性) else ''
+                    数量 = 数量 if pd.notna(数量) else None
+
+                    if not 户代码前12位:
                         error_count += 1
-                        error_details.append(f"第{idx+2}行处理失败: {str(e)}")
-                        logger.warning(f"处理第{idx+2}行数据失败: {str(e)}")
+                        _append_error_detail(error_details, f"第{idx+2}行: 户代码前12位为空")
                         continue
+                    if not 所在乡镇街道 or not 村居名称:
+                        error_count += 1
+                        _append_error_detail(error_details, f"第{idx+2}行: 所在乡镇街道或村居名称为空")
+                        continue
+
+                    prepared_rows.append((户代码前12位, 数量, 调查点类型, 所在乡镇街道, 村居名称, 调查员姓名, 调查员电话, 城乡属性))
+                    source_excel_rows.append(idx + 2)
+                except Exception as e:
+                    # 逐行失败只计数并保留详情，失败总数在导入完成日志中汇总输出
+                    error_count += 1
+                    _append_error_detail(error_details, f"第{idx+2}行处理失败: {str(e)}")
+                    continue
+
+            insert_sql = """
+            INSERT INTO 调查点村名单 (户代码前12位, 数量, 调查点类型, 所在乡镇街道, 村居名称, 调查员姓名, 调查员电话, 城乡属性)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """
+            update_sql = """
+            UPDATE 调查点村名单
+            SET 数量 = ?, 调查点类型 = ?, 所在乡镇街道 = ?, 村居名称 = ?, 调查员姓名 = ?, 调查员电话 = ?, 城乡属性 = ?
+            WHERE 户代码前12位 = ?
+            """
+
+            with db.pool.get_cursor() as cursor:
+                # 已存在的户代码前12位按块一次查出，不再逐行 SELECT COUNT(*) 探测
+                codes = list(dict.fromkeys(r[0] for r in prepared_rows))
+                existing_codes = set()
+                for i in range(0, len(codes), IN_CLAUSE_CHUNK_SIZE):
+                    chunk = codes[i:i + IN_CLAUSE_CHUNK_SIZE]
+                    cursor.execute(
+                        f"SELECT 户代码前12位 FROM 调查点村名单 WHERE 户代码前12位 IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                    existing_codes.update(r[0] for r in cursor.fetchall())
+
+                # 每个分块各用一次 executemany 完成新增和更新，分块之间提交，缩短写锁持有时间
+                for pos in range(0, len(prepared_rows), VILLAGE_IMPORT_COMMIT_CHUNK):
+                    if pos:
+                        cursor.connection.commit()
+                        committed_count = pos
+                        committed_excel_row = source_excel_rows[pos - 1]
+                        logger.debug("调查点村名单导入已提交 %d 条记录（至Excel第%d行）", committed_count, committed_excel_row)
+                    insert_params = []
+                    update_params = []
+                    for values in prepared_rows[pos:pos + VILLAGE_IMPORT_COMMIT_CHUNK]:
+                        if values[0] in existing_codes:
+                            update_params.append(values[1:] + values[:1])
+                        else:
+                            insert_params.append(values)
+                            existing_codes.add(values[0])
+                    if insert_params:
+                        cursor.executemany(insert_sql, insert_params)
+                    if update_params:
+                        cursor.executemany(update_sql, update_params)
+                    new_count += len(insert_params)
+                    updated_count += len(update_params)
 
             summary_message = "调查点村名单导入完成！\n"
             summary_message += f"• 总处理记录数：{total_rows} 条\n"
@@ -932,14 +999,25 @@ def import_village_list():
                 summary_message += f"• 错误记录：{error_count} 条\n"
                 if error_details:
                     summary_message += "• 错误详情：\n"
-                    for d in error_details[:5]:
+                    for d in error_details:
                         summary_message += f"  - {d}\n"
-                    if len(error_details) > 5:
-                        summary_message += f"  - 还有 {len(error_details) - 5} 个错误未显示\n"
+                    if error_count > len(error_details):
+                        summary_message += f"  - 还有 {error_count - len(error_details)} 个错误未显示\n"
             logger.info(f"调查点村名单导入完成 - 新增: {new_count}, 更新: {updated_count}, 错误: {error_count}")
+            if new_count or updated_count:
+                invalidate_town_village_mapping()
             return summary_message
         except Exception as e:
             logger.error(f"导入调查点村名单过程中发生错误: {str(e)}")
+            if committed_count:
+                committed_message = (
+                    f"已提交 {committed_count} 条有效记录（至Excel第{committed_excel_row}行），"
+                    f"可从第{committed_excel_row + 1}行继续导入"
+                )
+                logger.error(f"调查点村名单{committed_message}")
+                # 已提交的分块对读端可见，需同样失效乡镇村映射及统计缓存
+                invalidate_town_village_mapping()
+                return f"导入过程中发生错误: {str(e)}\n{committed_message}", 500
             return f"导入过程中发生错误: {str(e)}", 500
         finally:
             _cleanup_file(file_path)
@@ -77,17 +77,9 @@ def analyze_single_household():
         end_month = data.get('end_month')
 
         # 参数格式验证
-        if start_year and not ParamValidator.validate_year(start_year):
-            return ResponseHelper.error_response('开始年份格式错误', status_code=400)
-
-        if start_month and not ParamValidator.validate_month(start_month):
-            return ResponseHelper.error_response('开始月份格式错误', status_code=400)
-
-        if end_year and not ParamValidator.validate_year(end_year):
-            return ResponseHelper.error_response('结束年份格式错误', status_code=400)
-
-        if end_month and not ParamValidator.validate_month(end_month):
-            return ResponseHelper.error_response('结束月份格式错误', status_code=400)
+        period_error = ParamValidator.validate_period_params(start_year, start_month, end_year, end_month)
+        if period_error:
+            return ResponseHelper.error_response(period_error, status_code=400)
         
         logger.info(f"开始分析户: {household_code}")
         
@@ -145,17 +137,9 @@ def analyze_area_households():
         end_month = data.get('end_month')
 
         # 参数格式验证
-        if start_year and not ParamValidator.validate_year(start_year):
-            return ResponseHelper.error_response('开始年份格式错误', status_code=400)
-
-        if start_month and not ParamValidator.validate_month(start_month):
-            return ResponseHelper.error_response('开始月份格式错误', status_code=400)
-
-        if end_year and not ParamValidator.validate_year(end_year):
-            return ResponseHelper.error_response('结束年份格式错误', status_code=400)
-
-        if end_month and not ParamValidator.validate_month(end_month):
-            return ResponseHelper.error_response('结束月份格式错误', status_code=400)
+        period_error = ParamValidator.validate_period_params(start_year, start_month, end_year, end_month)
+        if period_error:
+            return ResponseHelper.error_response(period_error, status_code=400)
         
         logger.info(f"开始区域分析: 乡镇={town_name}, 村庄={village_name}")
         
@@ -6,11 +6,13 @@
 from flask import Blueprint, request, jsonify, render_template
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # 导入新的工具类
-from src.query_service import QueryService
+from src.query_service import QueryService, get_data_version, bump_data_version
 from src.response_helper import ResponseHelper, handle_api_exception
-from src.param_validator import validate_year_month_params, FilterBuilder
+from src.param_validator import validate_year_month_params, FilterBuilder, ParamValidator
 
 # 创建蓝图
 statistics_bp = Blueprint('statistics', __name__)
@@ -24,6 +26,14 @@ query_service = None
 _town_code_cache = None
 _town_code_lock = threading.Lock()
 
+_ALL_MONTHS = tuple(f"{i:02d}" for i in range(1, 13))
+
+# 可选年份/月份只在台账变更时变化，按数据版本缓存：(data_version, years, months)
+_period_options_cache = None
+
+# 年月选项缓存失效时，与户代码查询并行执行（WAL 模式下读查询可并发，各线程从连接池取独立连接）
+_filter_query_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='statistics-filters')
+
 def init_blueprint(database, error_handler):
     """初始化蓝图依赖"""
     global db, query_service
@@ -31,6 +41,53 @@ def init_blueprint(database, error_handler):
     query_service = QueryService(database)
     # error_handler is no longer needed as a global variable
 
+    # 启动时预加载乡镇村庄映射与可选年月，首个请求无需承担冷启动开销
+    if database is not None:
+        _warm_filter_caches()
+
+def _warm_filter_caches():
+    """预热乡镇村庄映射与可选年月缓存（失败时在首次请求时再加载）"""
+    try:
+        _get_town_village_mapping()
+        _get_period_options()
+    except Exception as e:
+        logger.warning(f"预加载筛选选项缓存失败，将在首次请求时加载: {e}")
+
+def warm_filter_caches_async():
+    """数据清空/恢复后在后台线程重新预热筛选选项缓存"""
+    threading.Thread(target=_warm_filter_caches, daemon=True).start()
+
+def _period_options_fresh():
+    """年月选项缓存是否对应当前数据版本"""
+    cached = _period_options_cache
+    return cached is not None and cached[0] == get_data_version()
+
+def _get_period_options():
+    """获取可选年份与月份列表（已按范围过滤并排序），按数据版本缓存"""
+    global _period_options_cache
+    cached = _period_options_cache
+    data_version = get_data_version()
+    if cached is not None and cached[0] == data_version:
+        return cached[1], cached[2]
+
+    # 优先扫描按村+年月预聚合的小表，汇总表不存在时回退到台账明细表
+    source_table = 'mv_month_stats' if query_service._table_exists('mv_month_stats') else '调查点台账合并'
+    rows = db.execute_query_safe(f"""
+        SELECT DISTINCT 'Y' AS k, CAST(year AS INTEGER) AS v
+        FROM `{source_table}`
+        WHERE CAST(year AS INTEGER) BETWEEN {ParamValidator.YEAR_MIN} AND {ParamValidator.YEAR_MAX}
+        UNION ALL
+        SELECT DISTINCT 'M' AS k, CAST(month AS INTEGER) AS v
+        FROM `{source_table}`
+        WHERE CAST(month AS INTEGER) BETWEEN {ParamValidator.MONTH_MIN} AND {ParamValidator.MONTH_MAX}
+    """)
+    # 年月范围已在SQL中过滤；月份与固定的 01~12 取交集即为有序结果
+    years = [str(v) for v in sorted(r[1] for r in rows if r[0] == 'Y')]
+    month_values = {r[1] for r in rows if r[0] == 'M'}
+    months = [m for i, m in enumerate(_ALL_MONTHS, 1) if i in month_values]
+    _period_options_cache = (data_version, years, months)
+    return years, months
+
 @statistics_bp.app_errorhandler(Exception)
 def handle_statistics_error(e):
     """
@@ -89,86 +146,145 @@ def _get_town_village_mapping():
                     # 构建村庄代码到村庄名称的映射
                     village_names[village_code] = village_name
 
-                _town_code_cache = {
+                _town_code_cache = _complete_town_mapping({
                     'town_to_villages': town_to_villages,
                     'village_to_town': village_to_town,
                     'village_names': village_names
-                }
+                })
                 logger.info(f"乡镇村庄映射缓存加载完成，共 {len(town_to_villages)} 个乡镇，{len(village_names)} 个村庄。")
     return _town_code_cache
 
-def _build_query_filters(table_alias='t', exclude_town=False):
+def _complete_town_mapping(mapping):
+    """补充各乡镇的 IN 子句占位符与参数元组（筛选时直接复用）"""
+    mapping['town_to_in_clause'] = {
+        town: (','.join(['?'] * len(codes)), tuple(codes))
+        for town, codes in mapping['town_to_villages'].items()
+    }
+    return mapping
+
+def invalidate_town_village_mapping():
+    """村名单变更后调用：清空进程内乡镇村庄映射缓存"""
+    global _town_code_cache
+    with _town_code_lock:
+        _town_code_cache = None
+        # 乡镇/村庄筛选结果随映射变化，统计结果缓存一并失效
+        bump_data_version()
+
+def _build_query_filters(table_alias='t', exclude_town=False, village_column=None):
     """
     从请求参数中构建SQL查询的WHERE子句和参数列表。
     使用v_town_village_list视图的映射关系
     """
     mapping = None if exclude_town else _get_town_village_mapping()
-    return FilterBuilder.build_from_request_with_mapping(table_alias, mapping, exclude_town)
+    return FilterBuilder.build_from_request_with_mapping(table_alias, mapping, exclude_town, village_column)
 
 @statistics_bp.route('/statistics')
 def statistics_page():
     """统计页面"""
     return render_template('statistics.html')
 
+@lru_cache(maxsize=256)
+def _cached_statistics(endpoint, data_version, args_key):
+    """
+    按 (接口, 数据版本, 请求参数) 缓存统计结果。
+    data_version/args_key 仅作为缓存键，结果由当前请求上下文计算；数据版本递增后旧条目不再命中并被逐步淘汰。
+    """
+    return _CACHED_STATISTICS_BUILDERS[endpoint]()
+
+def _cached_statistics_response(endpoint):
+    """读取（或计算并缓存）统计结果并返回标准响应"""
+    args_key = tuple(sorted(request.args.items(multi=True)))
+    return ResponseHelper.success_response(_cached_statistics(endpoint, get_data_version(), args_key))
+
 @statistics_bp.route('/api/statistics/overview')
 @handle_api_exception
 def get_overview_statistics():
     """获取总体统计概览"""
-    where_clause, params = _build_query_filters()
+    return _cached_statistics_response('overview')
 
-    sql = f"""
-    SELECT
-        COUNT(*), COUNT(DISTINCT t.hudm), COUNT(DISTINCT (t.year || '-' || t.month)),
-        SUM(CASE WHEN t.money > 0 THEN t.money ELSE 0 END),
-        SUM(CASE WHEN t.type = 1 THEN t.money ELSE 0 END),
-        SUM(CASE WHEN t.type = 2 THEN t.money ELSE 0 END),
-        COUNT(CASE WHEN t.code IS NULL THEN 1 END),
-        COUNT(CASE WHEN t.code IS NOT NULL THEN 1 END)
-    FROM `调查点台账合并` t
-    {where_clause}
-    """
+def _compute_overview_statistics():
+    """计算总体统计概览"""
+    # 优先读取按户+年月预聚合的汇总表，户数去重只需扫描汇总行；汇总表不存在时回退到实时查询
+    rollup_where_clause, rollup_params = _build_query_filters('s', village_column='s.village_code')
+    result = query_service.get_overview_statistics_from_rollup(rollup_where_clause, rollup_params)
+    if result is None:
+        result = _query_overview_statistics_live()
 
-    result = db.execute_query_safe(sql, params)
     if result and result[0]:
         data = result[0]
+        total_records = int(data[0] or 0)
+        uncoded_records = int(data[6] or 0)
         overview = {
-            'total_records': data[0] or 0, 'total_households': data[1] or 0,
+            'total_records': total_records, 'total_households': data[1] or 0,
             'total_months': data[2] or 0, 'total_amount': float(data[3] or 0),
             'total_income': float(data[4] or 0), 'total_expenditure': float(data[5] or 0),
-            'uncoded_records': data[6] or 0, 'coded_records': data[7] or 0
+            'uncoded_records': uncoded_records, 'coded_records': total_records - uncoded_records
         }
     else:
         overview = {k: 0 for k in ['total_records', 'total_households', 'total_months', 'total_amount', 'total_income', 'total_expenditure', 'uncoded_records', 'coded_records']}
 
-    return ResponseHelper.success_response(overview)
+    return overview
+
+def _query_overview_statistics_live():
+    """直接扫描台账明细表获取总体统计概览"""
+    where_clause, params = _build_query_filters()
+
+    # year/month 为 TEXT 列；月份取值 1~12，year*100+month 可唯一标识一个年月，避免逐行拼接字符串
+    # 条件聚合使用 FILTER 子句（SQLite 3.30+）；已编码笔数由总笔数减未编码笔数得出
+    sql = f"""
+    SELECT
+        COUNT(*), COUNT(DISTINCT t.hudm), COUNT(DISTINCT CAST(t.year AS INTEGER) * 100 + CAST(t.month AS INTEGER)),
+        TOTAL(t.money) FILTER (WHERE t.money > 0),
+        TOTAL(t.money) FILTER (WHERE t.type = 1),
+        TOTAL(t.money) FILTER (WHERE t.type = 2),
+        COUNT(*) FILTER (WHERE t.code IS NULL)
+    FROM `调查点台账合并` t
+    {where_clause}
+    """
+
+    return db.execute_query_safe(sql, params)
 
 @statistics_bp.route('/api/statistics/by_household')
 @validate_year_month_params
 @handle_api_exception
 def get_household_statistics():
     """获取分户统计数据"""
-    where_clause, params = _build_query_filters()
-    data = query_service.get_household_statistics(where_clause, params)
-    return ResponseHelper.success_response(data)
+    return _cached_statistics_response('household')
+
+def _compute_household_statistics():
+    """计算分户统计数据"""
+    # 优先读取按户+年月预聚合的汇总表，汇总表不存在时回退到实时查询
+    where_clause, params = _build_query_filters('s', village_column='s.village_code')
+    data = query_service.get_household_statistics_from_rollup(where_clause, params)
+    if data is None:
+        where_clause, params = _build_query_filters()
+        data = query_service.get_household_statistics(where_clause, params)
+    return data
 
 @statistics_bp.route('/api/statistics/by_town')
 @validate_year_month_params
 @handle_api_exception
 def get_town_statistics():
     """获取分乡镇统计数据（优化版本，避免N+1查询）"""
+    return _cached_statistics_response('town')
+
+def _compute_town_statistics():
+    """计算分乡镇统计数据"""
     # 构建筛选条件（排除乡镇筛选，因为在查询中处理）
-    base_where_clause, base_params = _build_query_filters(exclude_town=True)
+    # 优先读取按户+年月预聚合的汇总表，汇总表不存在时回退到缓存表/实时查询
+    rollup_where_clause, rollup_params = _build_query_filters('s', exclude_town=True, village_column='s.village_code')
+    town_stats = query_service.get_all_town_statistics_from_rollup(rollup_where_clause, rollup_params)
+    if town_stats is None:
+        base_where_clause, base_params = _build_query_filters(exclude_town=True)
+        # 使用优化后的一次性查询获取所有乡镇统计数据
+        town_stats = query_service.get_all_town_statistics(base_where_clause, base_params)
 
-    # 使用优化后的一次性查询获取所有乡镇统计数据
-    town_stats = query_service.get_all_town_statistics(base_where_clause, base_params)
+    return town_stats
 
-    return ResponseHelper.success_response(town_stats)
+_MONTH_STAT_COLUMNS = ('年份', '月份', '户数', '记账笔数', '收入笔数', '支出笔数', '收入总额', '支出总额', '未编码笔数', '已编码笔数')
 
-@statistics_bp.route('/api/statistics/by_month')
-@validate_year_month_params
-@handle_api_exception
-def get_month_statistics():
-    """获取分月统计数据（支持时间段范围筛选）"""
+def _query_month_statistics_live():
+    """直接扫描台账明细表获取分月统计"""
     where_clause, params = _build_query_filters()
 
     sql = f"""
@@ -177,54 +293,72 @@ def get_month_statistics():
         t.month,
         COUNT(*) AS `记账笔数`,
         COUNT(DISTINCT t.hudm) AS `户数`,
-        COUNT(CASE WHEN t.type = 1 THEN 1 END) AS `收入笔数`,
-        COUNT(CASE WHEN t.type = 2 THEN 1 END) AS `支出笔数`,
-        SUM(CASE WHEN t.type = 1 THEN t.money ELSE 0 END) AS `收入总额`,
-        SUM(CASE WHEN t.type = 2 THEN t.money ELSE 0 END) AS `支出总额`,
-        COUNT(CASE WHEN t.code IS NULL THEN 1 END) AS `未编码笔数`,
-        COUNT(CASE WHEN t.code IS NOT NULL THEN 1 END) AS `已编码笔数`
+        COUNT(*) FILTER (WHERE t.type = 1) AS `收入笔数`,
+        COUNT(*) FILTER (WHERE t.type = 2) AS `支出笔数`,
+        TOTAL(t.money) FILTER (WHERE t.type = 1) AS `收入总额`,
+        TOTAL(t.money) FILTER (WHERE t.type = 2) AS `支出总额`,
+        COUNT(*) FILTER (WHERE t.code IS NULL) AS `未编码笔数`
     FROM `调查点台账合并` t
     {where_clause}
     GROUP BY t.year, t.month
     ORDER BY t.year, t.month
     """
+    return db.execute_query_safe(sql, params)
+
+@statistics_bp.route('/api/statistics/by_month')
+@validate_year_month_params
+@handle_api_exception
+def get_month_statistics():
+    """获取分月统计数据（支持时间段范围筛选）"""
+    return _cached_statistics_response('month')
 
-    result = db.execute_query_safe(sql, params)
+def _compute_month_statistics():
+    """计算分月统计数据"""
+    result = None
+    # 未按户筛选时优先读取按村+年月预聚合的汇总表；汇总表不含户代码，按户筛选仍走实时查询
+    if not request.args.get('household'):
+        where_clause, params = _build_query_filters('m', village_column='m.village_code')
+        result = query_service.get_month_statistics_from_rollup(where_clause, params)
+
+    if result is None:
+        result = _query_month_statistics_live()
 
     # 将查询结果转换为前端所需的数组结构
-    rows = []
-    if result:
-        for r in result:
-            rows.append({
-                '年份': str(r[0]),
-                '月份': str(r[1]).zfill(2),
-                '户数': r[3] or 0,
-                '记账笔数': r[2] or 0,
-                '收入笔数': r[4] or 0,
-                '支出笔数': r[5] or 0,
-                '收入总额': float(r[6] or 0),
-                '支出总额': float(r[7] or 0),
-                '未编码笔数': r[8] or 0,
-                '已编码笔数': r[9] or 0
-            })
-
-    return ResponseHelper.success_response(rows)
+    rows = [
+        dict(zip(_MONTH_STAT_COLUMNS, (
+            str(r[0]), str(r[1]).zfill(2), r[3] or 0, r[2] or 0, r[4] or 0, r[5] or 0,
+            float(r[6] or 0), float(r[7] or 0), r[8] or 0, (r[2] or 0) - (r[8] or 0)
+        )))
+        for r in (result or [])
+    ]
+
+    return rows
 
 @statistics_bp.route('/api/statistics/consumption_structure')
 @validate_year_month_params
 @handle_api_exception
 def get_consumption_structure():
     """获取消费结构统计数据"""
+    return _cached_statistics_response('consumption_structure')
+
+def _compute_consumption_structure():
+    """计算消费结构统计数据"""
     where_clause, params = _build_query_filters()
-    data = query_service.get_consumption_structure(where_clause, params)
-    return ResponseHelper.success_response(data)
+    return query_service.get_consumption_structure(where_clause, params)
+
+_CACHED_STATISTICS_BUILDERS = {
+    'overview': _compute_overview_statistics,
+    'household': _compute_household_statistics,
+    'town': _compute_town_statistics,
+    'month': _compute_month_statistics,
+    'consumption_structure': _compute_consumption_structure,
+}
 
 def _build_household_filters_for_missing() -> (str, list):
     """仅为漏记账分析构建针对 h 表（调查点户名单）的筛选条件，排除 year/month 条件。
     乡镇/村庄/户代码统一使用 v_town_village_list 映射。
     """
     try:
-        from src.param_validator import ParamValidator
         params_dict = ParamValidator.get_validated_filter_params()
 
         conditions = []
@@ -245,13 +379,11 @@ def _build_household_filters_for_missing() -> (str, list):
                 params.append(village_code)
             else:
                 # 乡镇 -> 多村代码
-                town = params_dict.get('town')
-                if town and mapping and town in mapping.get('town_to_villages', {}):
-                    village_codes = mapping['town_to_villages'][town]
-                    if village_codes:
-                        placeholders = ','.join(['?' for _ in village_codes])
-                        conditions.append(f"SUBSTR(h.`户代码`, 1, 12) IN ({placeholders})")
-                        params.extend(village_codes)
+                in_clause = FilterBuilder.town_in_clause(mapping, params_dict.get('town'))
+                if in_clause:
+                    placeholders, village_codes = in_clause
+                    conditions.append(f"SUBSTR(h.`户代码`, 1, 12) IN ({placeholders})")
+                    params.extend(village_codes)
 
         where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
         return where_clause, params
@@ -316,13 +448,6 @@ def get_available_filters():
     town_filter = request.args.get('town')
     village_filter = request.args.get('village')
 
-    # 获取年份和月份选项
-    year_result = db.execute_query_safe("SELECT DISTINCT year FROM `调查点台账合并` WHERE year IS NOT NULL ORDER BY year")
-    years = sorted([str(row[0]) for row in year_result if row[0] and str(row[0]).isdigit() and 2020 <= int(row[0]) <= 2030])
-
-    month_result = db.execute_query_safe("SELECT DISTINCT month FROM `调查点台账合并` WHERE month IS NOT NULL ORDER BY month")
-    months = sorted([str(row[0]).zfill(2) for row in month_result if row[0] and str(row[0]).isdigit() and 1 <= int(row[0]) <= 12])
-
     mapping = _get_town_village_mapping()
     towns = list(mapping['town_to_villages'].keys())
 
@@ -336,38 +461,45 @@ def get_available_filters():
         villages = [{'name': name, 'code': code} for code, name in mapping['village_names'].items()]
         villages.sort(key=lambda x: x['name'])  # 按村庄名称排序
 
-    # 根据村庄筛选户代码
+    # 根据村庄/乡镇确定户代码的筛选条件
     if village_filter:
-        # village_filter现在是村代码，直接使用LEFT(t.hudm, 12)匹配
-        household_result = db.execute_query_safe(
-            """
-            SELECT DISTINCT t.hudm, h.`户主姓名`
-            FROM `调查点台账合并` t
-            LEFT JOIN `调查点户名单` h ON t.hudm = h.`户代码`
-            WHERE SUBSTR(t.hudm, 1, 12) = ?
-            ORDER BY t.hudm
-            """, [village_filter]
-        )
+        # village_filter现在是村代码，直接使用户代码前12位匹配
+        household_where = "WHERE SUBSTR(t.hudm, 1, 12) = ?"
+        household_params = [village_filter]
     elif town_filter and town_filter in mapping['town_to_villages']:
         # 根据乡镇获取所有村庄代码，然后筛选户代码
-        village_codes = mapping['town_to_villages'][town_filter]
-        if village_codes:
-            placeholders = ','.join(['?' for _ in village_codes])
-            household_result = db.execute_query_safe(
-                f"""
-                SELECT DISTINCT t.hudm, h.`户主姓名`
-                FROM `调查点台账合并` t
-                LEFT JOIN `调查点户名单` h ON t.hudm = h.`户代码`
-                WHERE SUBSTR(t.hudm, 1, 12) IN ({placeholders})
-                ORDER BY t.hudm
-                """, village_codes
-            )
+        in_clause = FilterBuilder.town_in_clause(mapping, town_filter)
+        if in_clause:
+            placeholders, village_codes = in_clause
+            household_where = f"WHERE SUBSTR(t.hudm, 1, 12) IN ({placeholders})"
+            household_params = list(village_codes)
         else:
-            household_result = []
+            household_where = "WHERE 0"
+            household_params = []
     else:
-        household_result = db.execute_query_safe(
-            "SELECT DISTINCT t.hudm, h.`户主姓名` FROM `调查点台账合并` t LEFT JOIN `调查点户名单` h ON t.hudm = h.`户代码` ORDER BY t.hudm"
-        )
+        household_where = ""
+        household_params = []
+
+    # 可选年月按数据版本缓存（启动时已预热）；缓存失效时与户代码查询并行获取
+    period_future = None if _period_options_fresh() else _filter_query_executor.submit(_get_period_options)
+
+    # 户数较多时分批流式读取
+    batches = db.execute_query_stream(
+        f"""
+        -- 以台账中出现的户为准（DISTINCT 可直接走 hudm / 村代码表达式索引），
+        -- 户名单只用于补充户主姓名：未登记的户同样保留，由下方以“未登记”占位
+        SELECT d.hudm, h.`户主姓名`
+        FROM (
+            SELECT DISTINCT t.hudm
+            FROM `调查点台账合并` t
+            {household_where}
+        ) d
+        LEFT JOIN `调查点户名单` h ON h.`户代码` = d.hudm
+        ORDER BY d.hudm
+        """, household_params
+    )
+    household_result = [row for batch in batches for row in batch]
+    years, months = period_future.result() if period_future else _get_period_options()
 
     # 保证前端下拉有名称可显示：若户主姓名缺失则使用“未登记”占位
     households = []
@@ -438,11 +570,11 @@ def get_households_by_town():
         return ResponseHelper.validation_error_response('town', '缺少乡镇参数')
 
     mapping = _get_town_village_mapping()
-    village_codes = mapping['town_to_villages'].get(town_name)
-    if not village_codes:
+    in_clause = FilterBuilder.town_in_clause(mapping, town_name)
+    if not in_clause:
         return ResponseHelper.success_response([])
 
-    placeholders = ','.join(['?' for _ in village_codes])
+    placeholders, village_codes = in_clause
     rows = db.execute_query_safe(
         f"""
         SELECT DISTINCT h.`户代码`,
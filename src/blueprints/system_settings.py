@@ -7,14 +7,18 @@
 """
 
 from flask import Blueprint, request, jsonify, send_file
+from werkzeug.wsgi import ClosingIterator
 import os
 import shutil
 import logging
+import tempfile
 from datetime import datetime
 
 import sqlite3
 
 from ..database_pool import get_connection_pool, close_connection_pool
+from ..query_service import QueryService
+from .statistics import invalidate_town_village_mapping, warm_filter_caches_async
 
 system_settings_bp = Blueprint('system_settings', __name__)
 logger = logging.getLogger(__name__)
@@ -44,10 +48,55 @@ def _db_path():
         return os.path.abspath(os.path.join(os.getcwd(), 'database.db'))
 
 
-def _is_valid_sqlite(file_path: str) -> bool:
+def _refresh_ledger_rollups():
+    """台账数据变更后重建统计预聚合汇总表并在后台预热筛选选项缓存（失败只记录日志，不影响主流程）"""
     try:
-        with open(file_path, 'rb') as f:
-            header = f.read(16)
+        QueryService(_db).refresh_ledger_rollups()
+    except Exception:
+        logger.warning('重建统计预聚合汇总表失败', exc_info=True)
+    warm_filter_caches_async()
+
+
+def _truncate_tables(*tables):
+    """
+    清空整表并返回各表影响行数。
+    - 外键检查开启时 SQLite 会逐行删除；这里仅在本连接上临时关闭外键，使无 WHERE 的 DELETE 走整表截断优化
+      （调用方需保证按“子表在前、父表在后”一并清空，或只清空子表）
+    - 删除后执行 wal_checkpoint(TRUNCATE)，避免 WAL 文件因大批量删除而膨胀
+    """
+    affected = {}
+    conn = _db.pool.get_connection()
+    try:
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute('PRAGMA secure_delete = OFF')
+        try:
+            with conn:
+                for table in tables:
+                    cur = conn.execute(f'DELETE FROM {table}')
+                    affected[table] = cur.rowcount if cur.rowcount != -1 else 0
+        finally:
+            conn.execute('PRAGMA foreign_keys = ON')
+        try:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception:
+            logger.warning('清空后执行 wal_checkpoint(TRUNCATE) 失败', exc_info=True)
+    finally:
+        _db.pool.return_connection(conn)
+    return affected
+
+
+def _remove_quietly(file_path: str):
+    try:
+        os.remove(file_path)
+    except Exception:
+        logger.warning(f'删除临时文件失败: {file_path}', exc_info=True)
+
+
+def _is_valid_sqlite_stream(stream) -> bool:
+    """校验上传流的 SQLite 文件头，读取后将流复位，便于随后保存"""
+    try:
+        header = stream.read(16)
+        stream.seek(0)
         return header == b'SQLite format 3\x00'
     except Exception:
         return False
@@ -63,18 +112,15 @@ def clear_household_list():
         affected_households = 0
         affected_accounts = 0
         try:
-            with _db.pool.get_cursor() as cursor:
-                # 先清空依赖“户代码”的账目数据，避免 FOREIGN KEY 约束失败
-                cursor.execute('DELETE FROM 调查点台账合并')
-                affected_accounts = cursor.rowcount if cursor.rowcount != -1 else 0
-
-                # 再清空户名单
-                cursor.execute('DELETE FROM 调查点户名单')
-                affected_households = cursor.rowcount if cursor.rowcount != -1 else 0
+            # 先清空依赖“户代码”的账目数据，再清空户名单（同一事务内，外键关系保持一致）
+            affected = _truncate_tables('调查点台账合并', '调查点户名单')
+            affected_accounts = affected['调查点台账合并']
+            affected_households = affected['调查点户名单']
         except Exception:
             logger.exception('清空 调查点户名单 失败')
             raise
         logger.warning(f'清空完成: 先清空台账 {affected_accounts} 行，再清空户名单 {affected_households} 行')
+        _refresh_ledger_rollups()
         return jsonify({'success': True, 'message': f'已清空：台账 {affected_accounts} 行；调查点户名单 {affected_households} 行。'})
     return _impl()
 
@@ -86,13 +132,13 @@ def clear_village_list():
         logger.warning('请求清空: 调查点村名单')
         affected = 0
         try:
-            with _db.pool.get_cursor() as cursor:
-                cursor.execute('DELETE FROM 调查点村名单')
-                affected = cursor.rowcount if cursor.rowcount != -1 else 0
+            affected = _truncate_tables('调查点村名单')['调查点村名单']
         except Exception:
             logger.exception('清空 调查点村名单 失败')
             raise
         logger.warning(f'清空完成: 调查点村名单, 影响行数={affected}')
+        invalidate_town_village_mapping()
+        warm_filter_caches_async()
         return jsonify({'success': True, 'message': f'已清空调查点村名单（{affected} 行）。'})
     return _impl()
 
@@ -104,13 +150,12 @@ def clear_account_data():
         logger.warning('请求清空: 调查点台账合并（当前账目数据）')
         affected = 0
         try:
-            with _db.pool.get_cursor() as cursor:
-                cursor.execute('DELETE FROM 调查点台账合并')
-                affected = cursor.rowcount if cursor.rowcount != -1 else 0
+            affected = _truncate_tables('调查点台账合并')['调查点台账合并']
         except Exception:
             logger.exception('清空 调查点台账合并 失败')
             raise
         logger.warning(f'清空完成: 调查点台账合并, 影响行数={affected}')
+        _refresh_ledger_rollups()
         return jsonify({'success': True, 'message': f'已清空当前账目数据（{affected} 行）。'})
     return _impl()
 
@@ -129,19 +174,38 @@ def backup_database():
         filename = f'database_backup_{ts}.db'
         upload_dir = os.path.abspath(_app_config.get('UPLOAD_FOLDER', 'uploads'))
         os.makedirs(upload_dir, exist_ok=True)
-        backup_path = os.path.join(upload_dir, filename)
+        fd, backup_path = tempfile.mkstemp(prefix='_backup_', suffix='.db', dir=upload_dir)
+        os.close(fd)
 
+        # 使用 SQLite 在线备份 API：写入中的 WAL 内容也会一致地包含在备份中，避免直接复制文件得到不完整的副本
         logger.info(f'开始备份数据库: {db_file} -> {backup_path}')
-        shutil.copy2(db_file, backup_path)
+        src_conn = None
+        dst_conn = None
+        try:
+            src_conn = sqlite3.connect(db_file, timeout=120)
+            dst_conn = sqlite3.connect(backup_path)
+            src_conn.backup(dst_conn, pages=1024)
+        except Exception:
+            logger.exception('数据库备份失败')
+            _remove_quietly(backup_path)
+            raise
+        finally:
+            if dst_conn:
+                dst_conn.close()
+            if src_conn:
+                src_conn.close()
         logger.info('数据库备份完成')
 
-        # 直接提供下载
-        return send_file(
+        # 直接提供下载，响应发送完毕后删除临时备份文件
+        response = send_file(
             backup_path,
             as_attachment=True,
             download_name=filename,
             mimetype='application/octet-stream'
         )
+        # send_file 为直通响应，不会触发 response.close 回调，需包装文件迭代器在关闭时删除
+        response.response = ClosingIterator(response.response, [lambda: _remove_quietly(backup_path)])
+        return response
     return _impl()
 
 
@@ -162,20 +226,17 @@ def restore_database():
         ts = datetime.now().strftime('%Y%m%d_%H%M%S')
         temp_restore_path = os.path.join(upload_dir, f'_restore_upload_{ts}.db')
 
-        file.save(temp_restore_path)
-        # 验证SQLite签名
-        if not _is_valid_sqlite(temp_restore_path):
-            try:
-                os.remove(temp_restore_path)
-            except Exception:
-                pass
+        # 先验证SQLite签名，无效上传不落盘
+        if not _is_valid_sqlite_stream(file.stream):
             return jsonify({'success': False, 'message': '上传的文件不是有效的SQLite数据库'}), 400
 
+        file.save(temp_restore_path)
+
         db_file = _db_path()
         if not os.path.exists(db_file):
             # 如果当前数据库不存在，直接放置
             logger.info('当前数据库不存在，将直接放置上传的数据库文件')
-            shutil.copy2(temp_restore_path, db_file)
+            shutil.copyfile(temp_restore_path, db_file)
             try:
                 os.remove(temp_restore_path)
             except Exception:
@@ -194,12 +255,13 @@ def restore_database():
         except Exception:
             logger.warning('关闭连接池时出现警告，但将继续恢复流程', exc_info=True)
 
-        shutil.copy2(db_file, pre_backup_path)
+        # copyfile 只复制数据（Linux 下走 sendfile/copy_file_range 内核拷贝），备份时间已体现在文件名中，无需复制元数据
+        shutil.copyfile(db_file, pre_backup_path)
         logger.info('当前数据库备份完成')
 
         # 覆盖数据库
         logger.info('开始替换数据库文件')
-        shutil.copy2(temp_restore_path, db_file)
+        shutil.copyfile(temp_restore_path, db_file)
         logger.info('数据库文件替换完成')
 
         # 重新初始化池到 _db
@@ -218,6 +280,8 @@ def restore_database():
             except Exception:
                 pass
 
+        invalidate_town_village_mapping()
+        _refresh_ledger_rollups()
         logger.info('数据库恢复完成')
         return jsonify({'success': True, 'message': '数据库已恢复成功。'})
     return _impl()
@@ -4,10 +4,117 @@
 为每个记账户生成多维度消费习惯标签
 """
 
+import copy
 import logging
-from typing import Dict, List
+import operator
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import numpy as np
-
+import pandas as pd
+from src.query_service import get_data_version
+
+
+# 分析用分类汇总 DataFrame 列
+CATEGORY_FRAME_COLUMNS = ['编码前缀', '收支类型', '总金额']
+
+# 标准消费支出类型映射（编码前缀 -> 名称），模块级常量，各户共用
+CONSUMPTION_CATEGORIES = {
+    '31': '食品烟酒',
+    '32': '衣着',
+    '33': '居住',
+    '34': '生活用品及服务',
+    '35': '交通通信',
+    '36': '教育文化娱乐',
+    '37': '医疗保健',
+    '38': '其他用品及服务'
+}
+OTHER_CONSUMPTION = '其他消费'
+_CONSUMPTION_CATEGORY_RANK = {
+    name: rank for rank, name in enumerate(list(CONSUMPTION_CATEGORIES.values()) + [OTHER_CONSUMPTION])
+}
+
+# 明细项目名称关键词分组（每组对应关键词掩码中的一位）
+COMM_BIT = 1 << 0
+CAR_BIT = 1 << 1
+PET_BIT = 1 << 2
+DECORATION_BIT = 1 << 3
+ENTERTAINMENT_BIT = 1 << 4
+
+_KEYWORD_GROUPS = {
+    COMM_BIT: ('通信', '网络', '流量', '话费', '宽带'),
+    CAR_BIT: ('汽车', '车', '油费', '停车', '保险', '维修'),
+    PET_BIT: ('宠物', '猫', '狗', '鸟', '鱼', '宠'),
+    DECORATION_BIT: ('装修', '家具', '电器', '建材'),
+    ENTERTAINMENT_BIT: ('娱乐', '旅游', '电影', '游戏', '运动'),
+}
+
+# 每组关键词导入时预编译为一个正则，逐行匹配在 C 正则引擎内完成
+_KEYWORD_PATTERNS = tuple(
+    (bit, re.compile('|'.join(re.escape(k) for k in keywords)))
+    for bit, keywords in _KEYWORD_GROUPS.items()
+)
+
+
+# 标签判定规则表：(编码前缀, 标签, 比较运算, 阈值, 明细关键词分组位)
+# 占比满足比较条件即命中；明细关键词分组位非空时，还要求该前缀下有命中该组关键词的支出明细
+STRUCTURE_RULES = (
+    ('31', '基本生活型', operator.gt, 0.4, None),
+    ('31', '发展享受型', operator.lt, 0.2, None),
+    ('35', '交通依赖型', operator.gt, 0.2, None),
+    ('33', '住房高压型', operator.gt, 0.3, None),
+    ('36', '教育投资型', operator.gt, 0.15, None),
+    ('37', '健康关注型', operator.gt, 0.15, None),
+)
+
+INCOME_RULES = (
+    ('21', '工资主导型', operator.gt, 0.6, None),
+    ('22', '经营主导型', operator.gt, 0.5, None),
+    ('23', '财产投资驱动型', operator.gt, 0.3, None),
+)
+
+LIFESTYLE_RULES = (
+    ('36', '家庭成长型', operator.gt, 0.15, None),
+    ('38', '人情社交型', operator.gt, 0.1, None),
+    ('35', '数字生活家', operator.gt, 0.15, COMM_BIT),
+    ('34', '便捷生活追求者', operator.gt, 0.08, None),
+    ('32', '品质生活型', operator.gt, 0.08, None),
+)
+
+PREFERENCE_RULES = (
+    ('37', '健康养生派', operator.gt, 0.12, None),
+    ('35', '汽车生活族', operator.gt, 0.15, CAR_BIT),
+    ('33', '居家装修族', operator.gt, 0.2, DECORATION_BIT),
+    ('36', '文化娱乐型', operator.gt, 0.1, ENTERTAINMENT_BIT),
+)
+
+
+# 多元收入型：没有单一收入来源占比超过该值
+DIVERSIFIED_INCOME_MAX_RATIO = 0.6
+# 美食爱好者：食品烟酒占比阈值和食品种类数阈值
+FOOD_LOVER_RATIO = 0.35
+FOOD_VARIETY_THRESHOLD = 10
+# 爱宠家庭：宠物相关支出金额阈值
+PET_SPENDING_THRESHOLD = 500
+
+# 人均月支出分档（从高到低，超过阈值即取该档），均未超过为低消费户；档位只有三级，按顺序比较
+CONSUMPTION_LEVEL_BRACKETS = ((3000, '高消费户'), (1500, '理性消费户'), (800, '节俭储蓄型'))
+# 月支出变异系数：低于前者为消费稳定型，高于后者为消费波动型
+STABLE_EXPENSE_CV = 0.2
+VOLATILE_EXPENSE_CV = 0.5
+
+# 储蓄率分档（从高到低），均未超过为债务驱动型
+SAVINGS_RATE_BRACKETS = ((0.3, '高储蓄率家庭'), (0.1, '稳健储蓄家庭'), (-0.1, '月光家庭'))
+# 赤字月份占比超过该值为收支失衡型
+DEFICIT_MONTHS_RATIO = 0.5
+
+# 单户画像结果缓存条目上限（LRU淘汰）
+PROFILE_CACHE_SIZE = 1024
+
+# 批量画像的几类数据查询互不依赖，并行执行（读查询可并发，各线程从连接池取独立连接）
+_bulk_fetch_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='profile-bulk-fetch')
 
 class ConsumptionProfileEngine:
     """消费习惯画像分析引擎"""
@@ -21,6 +128,9 @@ class ConsumptionProfileEngine:
         """
         self.dal = dal
         self.logger = logging.getLogger(__name__)
+        # 单户画像缓存：键含数据版本号，台账写入后版本号递增，旧条目自然失效
+        self._profile_cache = OrderedDict()
+        self._profile_cache_lock = threading.Lock()
     
     def generate_household_profile(self, household_code: str,
                                  start_year: str = None, start_month: str = None,
@@ -38,6 +148,30 @@ class ConsumptionProfileEngine:
         Returns:
             消费习惯画像字典
         """
+        cache_key = (household_code, start_year, start_month, end_year, end_month, get_data_version())
+        with self._profile_cache_lock:
+            cached = self._profile_cache.get(cache_key)
+            if cached is not None:
+                self._profile_cache.move_to_end(cache_key)
+        if cached is not None:
+            # 返回副本，避免调用方修改影响缓存内容
+            return copy.deepcopy(cached)
+
+        profile = self._generate_household_profile_uncached(
+            household_code, start_year, start_month, end_year, end_month
+        )
+        if profile:
+            with self._profile_cache_lock:
+                self._profile_cache[cache_key] = copy.deepcopy(profile)
+                self._profile_cache.move_to_end(cache_key)
+                while len(self._profile_cache) > PROFILE_CACHE_SIZE:
+                    self._profile_cache.popitem(last=False)
+        return profile
+
+    def _generate_household_profile_uncached(self, household_code: str,
+                                             start_year: str, start_month: str,
+                                             end_year: str, end_month: str) -> Dict:
+        """查询数据库并生成户消费习惯画像（不经过缓存）"""
         try:
             # 获取基础数据
             basic_info = self.dal.get_household_basic_info(household_code)
@@ -64,6 +198,54 @@ class ConsumptionProfileEngine:
                 household_code, start_year, start_month, end_year, end_month
             )
             
+            return self._build_profile_from_data(
+                household_code, basic_info, category_summary, monthly_summary, income_expense_data,
+                start_year=start_year, start_month=start_month, end_year=end_year, end_month=end_month
+            )
+            
+        except Exception as e:
+            self.logger.error(f"生成户消费画像失败: {household_code}, 错误: {e}")
+            return {}
+
+    def _build_profile_from_data(self, household_code: str, basic_info: Dict,
+                                 category_summary: List[Dict], monthly_summary: List[Dict],
+                                 income_expense_data: List[Dict], aggregates: Dict = None,
+                                 start_year: str = None, start_month: str = None,
+                                 end_year: str = None, end_month: str = None) -> Dict:
+        """
+        根据已获取的数据生成户消费习惯画像（不访问数据库）
+
+        Args:
+            household_code: 户代码
+            basic_info: 基础信息
+            category_summary: 分类汇总数据
+            monthly_summary: 月度汇总数据
+            income_expense_data: 收支明细数据
+            aggregates: 预先批量计算的汇总指标（见 _compute_batch_aggregates），为空时按本户数据计算
+            start_year: 开始年份
+            start_month: 开始月份
+            end_year: 结束年份
+            end_month: 结束月份
+
+        Returns:
+            消费习惯画像字典
+        """
+        try:
+            if aggregates is None:
+                aggregates = self._compute_batch_aggregates(
+                    {household_code: category_summary}, {household_code: monthly_summary}
+                )[household_code]
+
+            expense_ratios = aggregates['支出占比']
+            income_ratios = aggregates['收入占比']
+            total_expense = aggregates['支出总额']
+            total_income = aggregates['收入总额']
+
+            # 明细数据一次遍历建立编码前缀索引和关键词掩码
+            ledger_index = self._index_ledger(income_expense_data)
+            # 分类汇总按收支类型只划分一次；占比与总额已由 _compute_batch_aggregates 统一计算
+            expense_rows = [item for item in category_summary if item['收支类型'] == 2]
+
             # 生成各类标签
             profile = {
                 '户代码': household_code,
@@ -72,15 +254,16 @@ class ConsumptionProfileEngine:
                     '开始': f"{start_year}-{start_month}" if start_year and start_month else None,
                     '结束': f"{end_year}-{end_month}" if end_year and end_month else None
                 },
-                '消费结构型标签': self._analyze_consumption_structure(category_summary, basic_info),
+                '消费结构型标签': self._analyze_consumption_structure(expense_ratios, total_expense, basic_info),
                 '消费水平型标签': self._analyze_consumption_level(monthly_summary, basic_info),
-                '财务健康型标签': self._analyze_financial_health(monthly_summary, basic_info),
-                '收入结构型标签': self._analyze_income_structure(category_summary),
-                '生活方式型标签': self._analyze_lifestyle(category_summary, income_expense_data),
-                '消费偏好型标签': self._analyze_consumption_preferences(category_summary, income_expense_data),
+                '财务健康型标签': self._analyze_financial_health(aggregates['月度汇总'], basic_info),
+                '收入结构型标签': self._analyze_income_structure(income_ratios, total_income),
+                '生活方式型标签': self._analyze_lifestyle(expense_ratios, total_expense, ledger_index),
+                '消费偏好型标签': self._analyze_consumption_preferences(expense_ratios, total_expense,
+                                                                      income_expense_data, ledger_index),
                 # 添加详细分析
-                '消费习惯': self._analyze_consumption_habits(category_summary, monthly_summary, income_expense_data),
-                '消费结构': self._analyze_detailed_consumption_structure(category_summary)
+                '消费习惯': self._analyze_consumption_habits(expense_rows, monthly_summary, income_expense_data),
+                '消费结构': self._analyze_detailed_consumption_structure(aggregates['消费支出'])
             }
             
             return profile
@@ -88,60 +271,173 @@ class ConsumptionProfileEngine:
         except Exception as e:
             self.logger.error(f"生成户消费画像失败: {household_code}, 错误: {e}")
             return {}
+
+    def _compute_batch_aggregates(self, category_summaries: Dict[str, List[Dict]],
+                                  monthly_summaries: Dict[str, List[Dict]]) -> Dict[str, Dict]:
+        """
+        批量计算各户汇总指标：全部户的数据拼成一张表一次向量化计算，逐户只做字典取值
+
+        Args:
+            category_summaries: 户代码到分类汇总数据的映射
+            monthly_summaries: 户代码到月度汇总数据的映射
+
+        Returns:
+            户代码到汇总指标字典的映射，包含：支出占比/收入占比（编码前缀 -> 占比）、
+            支出总额/收入总额、消费支出（标准消费分类 -> 金额，按金额降序）、
+            月度汇总（收入总额/支出总额/赤字月数/月份数）
+        """
+        codes = list(dict.fromkeys(list(category_summaries) + list(monthly_summaries)))
+
+        cat_df = pd.DataFrame(
+            [(code, item['编码前缀'], item['收支类型'], item['总金额'])
+             for code, items in category_summaries.items() for item in items],
+            columns=['户代码'] + CATEGORY_FRAME_COLUMNS
+        ).astype({'编码前缀': 'category', '总金额': 'float64'})
+
+        # 各户按收支类型、编码前缀汇总，再除以本户该收支类型总额得到占比
+        sums = cat_df.groupby(['户代码', '收支类型', '编码前缀'], observed=True)['总金额'].sum()
+        totals = sums.groupby(level=[0, 1]).transform('sum')
+        ratios = sums / totals
+
+        type_totals = {}
+        ratio_maps = {}
+        for (code, type_value, prefix), ratio, total in zip(sums.index, ratios.to_numpy(), totals.to_numpy()):
+            type_totals[(code, type_value)] = float(total)
+            if total > 0:
+                ratio_maps.setdefault((code, type_value), {})[prefix] = float(ratio)
+
+        # 标准消费分类金额（金额非正的记录不计入，不在标准分类中的支出归入"其他消费"），
+        # 同户内按金额降序、金额相同按标准分类顺序排列
+        expense = cat_df[(cat_df['收支类型'] == 2) & (cat_df['总金额'] > 0)]
+        consumption = expense.assign(
+            类别=expense['编码前缀'].astype(str).map(CONSUMPTION_CATEGORIES).fillna(OTHER_CONSUMPTION)
+        ).groupby(['户代码', '类别'])['总金额'].sum().reset_index()
+        consumption['顺序'] = consumption['类别'].map(_CONSUMPTION_CATEGORY_RANK)
+        consumption = consumption.sort_values(['户代码', '总金额', '顺序'], ascending=[True, False, True])
+
+        consumption_maps = {}
+        for code, category, amount in zip(consumption['户代码'], consumption['类别'], consumption['总金额']):
+            consumption_maps.setdefault(code, {})[category] = float(amount)
+
+        # 月度收支合计与赤字月份数：各户月度行按户连续排成列数组，每行记下所属户的序号，
+        # 再按序号 bincount 分组求和；minlength 保证没有月度数据的户得到 0
+        # （不用 np.add.reduceat：空分段会返回下一段的首行而不是 0）
+        month_counts = np.array([len(monthly_summaries.get(code, ())) for code in codes], dtype=np.int64)
+        monthly_values = np.array(
+            [(item['收入总额'], item['支出总额'], item['收支差额'] < 0)
+             for code in codes for item in monthly_summaries.get(code, ())],
+            dtype=float
+        ).reshape(-1, 3)
+        household_ids = np.repeat(np.arange(len(codes)), month_counts)
+        monthly_totals = np.column_stack([
+            np.bincount(household_ids, weights=monthly_values[:, col], minlength=len(codes))
+            for col in range(3)
+        ]) if codes else np.zeros((0, 3))
+
+        return {
+            code: {
+                '支出占比': ratio_maps.get((code, 2), {}),
+                '收入占比': ratio_maps.get((code, 1), {}),
+                '支出总额': type_totals.get((code, 2), 0.0),
+                '收入总额': type_totals.get((code, 1), 0.0),
+                '消费支出': consumption_maps.get(code, {}),
+                '月度汇总': {
+                    '收入总额': float(monthly_totals[i, 0]),
+                    '支出总额': float(monthly_totals[i, 1]),
+                    '赤字月数': int(monthly_totals[i, 2]),
+                    '月份数': int(month_counts[i])
+                },
+            }
+            for i, code in enumerate(codes)
+        }
+
+    def _index_ledger(self, income_expense_data: List[Dict]) -> Tuple[Dict[str, List[int]], np.ndarray, np.ndarray]:
+        """
+        一次遍历收支明细，建立支出记录的编码前缀索引和项目名称关键词掩码
+
+        Args:
+            income_expense_data: 收支明细数据
+
+        Returns:
+            (编码前缀 -> 支出记录下标列表, 每行关键词掩码, 每行金额)；非支出记录掩码为0
+        """
+        by_prefix = {}
+        keyword_mask = np.zeros(len(income_expense_data), dtype=np.uint32)
+        amounts = np.zeros(len(income_expense_data), dtype=float)
+
+        for i, item in enumerate(income_expense_data):
+            amounts[i] = item['金额']
+            if item['收支类型'] != 2:
+                continue
+
+            code = item['编码']
+            if code:
+                by_prefix.setdefault(code[:2], []).append(i)
+
+            name = item['项目名称']
+            if name:
+                mask = 0
+                for bit, pattern in _KEYWORD_PATTERNS:
+                    if pattern.search(name):
+                        mask |= bit
+                keyword_mask[i] = mask
+
+        return by_prefix, keyword_mask, amounts
+
+    @staticmethod
+    def _prefix_has_keyword(ledger_index, prefix: str, bit: int) -> bool:
+        """判断某编码前缀下的支出记录是否命中指定关键词分组"""
+        by_prefix, keyword_mask, _ = ledger_index
+        rows = by_prefix.get(prefix)
+        return bool(rows) and bool((keyword_mask[rows] & bit).any())
+    
+    def _apply_ratio_rules(self, rules, ratios: Dict[str, float], ledger_index=None) -> List[str]:
+        """
+        按规则表依次判定占比类标签
+
+        Args:
+            rules: 规则表，元素为 (编码前缀, 标签, 比较运算, 阈值, 明细关键词分组位或None)
+            ratios: 各编码前缀占比
+            ledger_index: 收支明细索引（规则含明细关键词条件时需要）
+
+        Returns:
+            命中的标签列表（保持规则表顺序）
+        """
+        tags = []
+        # 缺失的编码前缀按占比0参与比较，不能跳过：'<' 规则（如发展享受型）在前缀缺失时同样命中
+        for prefix, tag, compare, threshold, keyword_bit in rules:
+            if not compare(ratios.get(prefix, 0.0), threshold):
+                continue
+            if keyword_bit and not self._prefix_has_keyword(ledger_index, prefix, keyword_bit):
+                continue
+            tags.append(tag)
+        return tags
+
+    @staticmethod
+    def _bracket_tag(value: float, brackets, default: str) -> str:
+        """按从高到低的分档阈值取第一个 value 超过的档位标签"""
+        for threshold, tag in brackets:
+            if value > threshold:
+                return tag
+        return default
     
-    def _analyze_consumption_structure(self, category_summary: List[Dict], basic_info: Dict) -> List[str]:
+    def _analyze_consumption_structure(self, expense_ratios: Dict[str, float], total_expense: float,
+                                       basic_info: Dict) -> List[str]:
         """
         分析消费结构型标签
         
         Args:
-            category_summary: 分类汇总数据
+            expense_ratios: 各编码前缀支出占比
+            total_expense: 支出总额
             basic_info: 基础信息
             
         Returns:
             消费结构型标签列表
         """
-        tags = []
-        
-        # 计算各类消费支出占比
-        expense_data = [item for item in category_summary if item['收支类型'] == 2]
-        total_expense = sum(item['总金额'] for item in expense_data)
-        
         if total_expense <= 0:
             return ['数据不足']
         
-        # 计算各类支出占比
-        ratios = {}
-        for item in expense_data:
-            prefix = item['编码前缀']
-            ratios[prefix] = item['总金额'] / total_expense
-        
-        # 基本生活型判断（食品烟酒占比高）
-        food_ratio = ratios.get('31', 0)
-        if food_ratio > 0.4:
-            tags.append('基本生活型')
-        elif food_ratio < 0.2:
-            tags.append('发展享受型')
-        
-        # 交通依赖型判断
-        transport_ratio = ratios.get('35', 0)
-        if transport_ratio > 0.2:
-            tags.append('交通依赖型')
-        
-        # 住房高压型判断
-        housing_ratio = ratios.get('33', 0)
-        if housing_ratio > 0.3:
-            tags.append('住房高压型')
-        
-        # 教育投资型判断
-        education_ratio = ratios.get('36', 0)
-        if education_ratio > 0.15:
-            tags.append('教育投资型')
-        
-        # 健康关注型判断
-        health_ratio = ratios.get('37', 0)
-        if health_ratio > 0.15:
-            tags.append('健康关注型')
-        
+        tags = self._apply_ratio_rules(STRUCTURE_RULES, expense_ratios)
         return tags if tags else ['均衡消费型']
     
     def _analyze_consumption_level(self, monthly_summary: List[Dict], basic_info: Dict) -> List[str]:
@@ -169,33 +465,34 @@ class ConsumptionProfileEngine:
         avg_per_capita_expense = avg_monthly_expense / household_size
         
         # 根据人均月支出水平分类（这里使用相对标准，实际应用中可根据当地经济水平调整）
-        if avg_per_capita_expense > 3000:
-            tags.append('高消费户')
-        elif avg_per_capita_expense > 1500:
-            tags.append('理性消费户')
-        elif avg_per_capita_expense > 800:
-            tags.append('节俭储蓄型')
-        else:
-            tags.append('低消费户')
+        tags.append(self._bracket_tag(avg_per_capita_expense, CONSUMPTION_LEVEL_BRACKETS, '低消费户'))
         
         # 消费稳定性分析
         if months_count >= 3:
-            expenses = [item['支出总额'] for item in monthly_summary]
-            cv = np.std(expenses) / np.mean(expenses) if np.mean(expenses) > 0 else 0
+            # 单次遍历求变异系数（σ² = E[x²] - E[x]²），月份数很少，不必构造 ndarray
+            total = 0.0
+            total_sq = 0.0
+            for item in monthly_summary:
+                x = item['支出总额']
+                total += x
+                total_sq += x * x
+            mean = total / months_count
+            variance = max(total_sq / months_count - mean * mean, 0.0)
+            cv = variance ** 0.5 / mean if mean > 0 else 0
             
-            if cv < 0.2:
+            if cv < STABLE_EXPENSE_CV:
                 tags.append('消费稳定型')
-            elif cv > 0.5:
+            elif cv > VOLATILE_EXPENSE_CV:
                 tags.append('消费波动型')
         
         return tags
     
-    def _analyze_financial_health(self, monthly_summary: List[Dict], basic_info: Dict) -> List[str]:
+    def _analyze_financial_health(self, monthly_totals: Dict, basic_info: Dict) -> List[str]:
         """
         分析财务健康型标签
         
         Args:
-            monthly_summary: 月度汇总数据
+            monthly_totals: 月度收支合计（收入总额、支出总额、赤字月数、月份数）
             basic_info: 基础信息
             
         Returns:
@@ -203,217 +500,112 @@ class ConsumptionProfileEngine:
         """
         tags = []
         
-        if not monthly_summary:
+        if not monthly_totals['月份数']:
             return ['数据不足']
         
         # 计算储蓄率
-        total_income = sum(item['收入总额'] for item in monthly_summary)
-        total_expense = sum(item['支出总额'] for item in monthly_summary)
+        total_income = monthly_totals['收入总额']
+        total_expense = monthly_totals['支出总额']
         
         if total_income > 0:
             savings_rate = (total_income - total_expense) / total_income
-            
-            if savings_rate > 0.3:
-                tags.append('高储蓄率家庭')
-            elif savings_rate > 0.1:
-                tags.append('稳健储蓄家庭')
-            elif savings_rate > -0.1:
-                tags.append('月光家庭')
-            else:
-                tags.append('债务驱动型')
+            tags.append(self._bracket_tag(savings_rate, SAVINGS_RATE_BRACKETS, '债务驱动型'))
         
         # 收支平衡分析
-        deficit_months = sum(1 for item in monthly_summary if item['收支差额'] < 0)
-        total_months = len(monthly_summary)
+        deficit_months = monthly_totals['赤字月数']
+        total_months = monthly_totals['月份数']
         
-        if deficit_months / total_months > 0.5:
+        if deficit_months / total_months > DEFICIT_MONTHS_RATIO:
             tags.append('收支失衡型')
         elif deficit_months == 0:
             tags.append('收支平衡型')
         
         return tags
     
-    def _analyze_income_structure(self, category_summary: List[Dict]) -> List[str]:
+    def _analyze_income_structure(self, income_ratios: Dict[str, float], total_income: float) -> List[str]:
         """
         分析收入结构型标签
         
         Args:
-            category_summary: 分类汇总数据
+            income_ratios: 各编码前缀收入占比
+            total_income: 收入总额
             
         Returns:
             收入结构型标签列表
         """
-        tags = []
-        
-        # 获取收入数据
-        income_data = [item for item in category_summary if item['收支类型'] == 1]
-        total_income = sum(item['总金额'] for item in income_data)
-        
         if total_income <= 0:
             return ['数据不足']
         
-        # 计算各类收入占比
-        income_ratios = {}
-        for item in income_data:
-            prefix = item['编码前缀']
-            income_ratios[prefix] = item['总金额'] / total_income
-        
-        # 工资主导型（21开头）
-        wage_ratio = income_ratios.get('21', 0)
-        if wage_ratio > 0.6:
-            tags.append('工资主导型')
+        tags = self._apply_ratio_rules(INCOME_RULES, income_ratios)
         
-        # 经营主导型（22开头）
-        business_ratio = income_ratios.get('22', 0)
-        if business_ratio > 0.5:
-            tags.append('经营主导型')
-        
-        # 财产投资驱动型（23开头）
-        property_ratio = income_ratios.get('23', 0)
-        if property_ratio > 0.3:
-            tags.append('财产投资驱动型')
-        
-        # 多元收入型（没有单一收入占比超过60%）
+        # 多元收入型（没有单一收入占比超过阈值）
         max_ratio = max(income_ratios.values()) if income_ratios else 0
-        if max_ratio < 0.6 and len(income_ratios) >= 2:
+        if max_ratio < DIVERSIFIED_INCOME_MAX_RATIO and len(income_ratios) >= 2:
             tags.append('多元收入型')
         
         return tags if tags else ['单一收入型']
 
-    def _analyze_lifestyle(self, category_summary: List[Dict], income_expense_data: List[Dict]) -> List[str]:
+    def _analyze_lifestyle(self, expense_ratios: Dict[str, float], total_expense: float,
+                           ledger_index) -> List[str]:
         """
         分析生活方式型标签
 
         Args:
-            category_summary: 分类汇总数据
-            income_expense_data: 收支明细数据
+            expense_ratios: 各编码前缀支出占比
+            total_expense: 支出总额
+            ledger_index: 收支明细索引（见 _index_ledger）
 
         Returns:
             生活方式型标签列表
         """
-        tags = []
-
-        # 获取支出数据
-        expense_data = [item for item in category_summary if item['收支类型'] == 2]
-        total_expense = sum(item['总金额'] for item in expense_data)
-
         if total_expense <= 0:
             return ['数据不足']
 
-        # 计算各类支出占比
-        expense_ratios = {}
-        for item in expense_data:
-            prefix = item['编码前缀']
-            expense_ratios[prefix] = item['总金额'] / total_expense
-
-        # 家庭成长型（教育文化娱乐支出高）
-        education_ratio = expense_ratios.get('36', 0)
-        if education_ratio > 0.15:
-            tags.append('家庭成长型')
-
-        # 人情社交型（其他用品及服务支出高，通常包含礼金等）
-        other_ratio = expense_ratios.get('38', 0)
-        if other_ratio > 0.1:
-            tags.append('人情社交型')
-
-        # 数字生活家（通过交通通信支出判断，包含通信费、网络费等）
-        transport_comm_ratio = expense_ratios.get('35', 0)
-        if transport_comm_ratio > 0.15:
-            # 进一步分析明细数据中是否有通信相关支出
-            comm_related = [item for item in income_expense_data
-                          if item['收支类型'] == 2 and item['编码'] and item['编码'].startswith('35')
-                          and any(keyword in (item['项目名称'] or '') for keyword in ['通信', '网络', '流量', '话费', '宽带'])]
-            if comm_related:
-                tags.append('数字生活家')
-
-        # 便捷生活追求者（生活用品及服务支出较高）
-        daily_goods_ratio = expense_ratios.get('34', 0)
-        if daily_goods_ratio > 0.08:
-            tags.append('便捷生活追求者')
-
-        # 品质生活型（衣着支出占比较高）
-        clothing_ratio = expense_ratios.get('32', 0)
-        if clothing_ratio > 0.08:
-            tags.append('品质生活型')
-
+        tags = self._apply_ratio_rules(LIFESTYLE_RULES, expense_ratios, ledger_index)
         return tags if tags else ['朴素生活型']
 
-    def _analyze_consumption_preferences(self, category_summary: List[Dict],
-                                       income_expense_data: List[Dict]) -> List[str]:
+    def _analyze_consumption_preferences(self, expense_ratios: Dict[str, float], total_expense: float,
+                                       income_expense_data: List[Dict], ledger_index) -> List[str]:
         """
         分析消费偏好型标签
 
         Args:
-            category_summary: 分类汇总数据
+            expense_ratios: 各编码前缀支出占比
+            total_expense: 支出总额
             income_expense_data: 收支明细数据
+            ledger_index: 收支明细索引（见 _index_ledger）
 
         Returns:
             消费偏好型标签列表
         """
         tags = []
 
-        # 获取支出数据
-        expense_data = [item for item in category_summary if item['收支类型'] == 2]
-        total_expense = sum(item['总金额'] for item in expense_data)
-
         if total_expense <= 0:
             return ['数据不足']
 
-        # 计算各类支出占比
-        expense_ratios = {}
-        for item in expense_data:
-            prefix = item['编码前缀']
-            expense_ratios[prefix] = item['总金额'] / total_expense
+        by_prefix, keyword_mask, amounts = ledger_index
 
         # 美食爱好者（食品烟酒支出高且种类丰富）
-        food_ratio = expense_ratios.get('31', 0)
-        if food_ratio > 0.35:
-            # 检查食品支出的多样性
-            food_items = [item for item in income_expense_data
-                         if item['收支类型'] == 2 and item['编码'] and item['编码'].startswith('31')]
-            unique_food_types = len(set(item['项目名称'] for item in food_items if item['项目名称']))
-            if unique_food_types > 10:
-                tags.append('美食爱好者')
-
-        # 健康养生派（医疗保健支出高）
-        health_ratio = expense_ratios.get('37', 0)
-        if health_ratio > 0.12:
-            tags.append('健康养生派')
+        if expense_ratios.get('31', 0.0) > FOOD_LOVER_RATIO:
+            # 检查食品支出的多样性：种类数超过阈值即可判定，无需遍历全部食品明细
+            seen = set()
+            for i in by_prefix.get('31', ()):
+                name = income_expense_data[i]['项目名称']
+                if not name:
+                    continue
+                seen.add(name)
+                if len(seen) > FOOD_VARIETY_THRESHOLD:
+                    tags.append('美食爱好者')
+                    break
+
+        # 健康养生派、汽车生活族、居家装修族、文化娱乐型
+        tags.extend(self._apply_ratio_rules(PREFERENCE_RULES, expense_ratios, ledger_index))
 
         # 爱宠家庭（通过项目名称关键词识别）
-        pet_related = [item for item in income_expense_data
-                      if item['收支类型'] == 2 and item['项目名称'] and
-                      any(keyword in item['项目名称'] for keyword in ['宠物', '猫', '狗', '鸟', '鱼', '宠'])]
-        if pet_related and sum(item['金额'] for item in pet_related) > 500:
+        pet_rows = (keyword_mask & PET_BIT).astype(bool)
+        if pet_rows.any() and amounts[pet_rows].sum() > PET_SPENDING_THRESHOLD:
             tags.append('爱宠家庭')
 
-        # 汽车生活族（交通支出高且有汽车相关支出）
-        transport_ratio = expense_ratios.get('35', 0)
-        if transport_ratio > 0.15:
-            car_related = [item for item in income_expense_data
-                          if item['收支类型'] == 2 and item['编码'] and item['编码'].startswith('35')
-                          and any(keyword in (item['项目名称'] or '') for keyword in ['汽车', '车', '油费', '停车', '保险', '维修'])]
-            if car_related:
-                tags.append('汽车生活族')
-
-        # 居家装修族（居住支出高）
-        housing_ratio = expense_ratios.get('33', 0)
-        if housing_ratio > 0.2:
-            decoration_related = [item for item in income_expense_data
-                                if item['收支类型'] == 2 and item['编码'] and item['编码'].startswith('33')
-                                and any(keyword in (item['项目名称'] or '') for keyword in ['装修', '家具', '电器', '建材'])]
-            if decoration_related:
-                tags.append('居家装修族')
-
-        # 文化娱乐型（教育文化娱乐支出中娱乐部分较多）
-        culture_ratio = expense_ratios.get('36', 0)
-        if culture_ratio > 0.1:
-            entertainment_related = [item for item in income_expense_data
-                                   if item['收支类型'] == 2 and item['编码'] and item['编码'].startswith('36')
-                                   and any(keyword in (item['项目名称'] or '') for keyword in ['娱乐', '旅游', '电影', '游戏', '运动'])]
-            if entertainment_related:
-                tags.append('文化娱乐型')
-
         return tags if tags else ['实用主义型']
 
     def generate_batch_profiles(self, household_codes: List[str],
@@ -434,10 +626,43 @@ class ConsumptionProfileEngine:
         """
         profiles = {}
 
+        # 每类数据对全部户只查询一次，再按户切片生成画像；
+        # 三类汇总查询提交到后台线程，与当前线程的明细查询并行
+        period = (start_year, start_month, end_year, end_month)
+        basic_info_future = _bulk_fetch_executor.submit(self.dal.get_households_basic_info, household_codes)
+        category_future = _bulk_fetch_executor.submit(
+            self.dal.get_households_category_summary, household_codes, *period
+        )
+        monthly_future = _bulk_fetch_executor.submit(
+            self.dal.get_households_monthly_summary, household_codes, *period
+        )
+        ledgers = self.dal.get_households_income_expense_data(household_codes, *period)
+        basic_infos = basic_info_future.result()
+        category_summaries = category_future.result()
+        monthly_summaries = monthly_future.result()
+
+        # 全部户的占比、消费分类金额和月度合计一次向量化算出，逐户只做标签判定
+        aggregates = self._compute_batch_aggregates(category_summaries, monthly_summaries)
+
         for household_code in household_codes:
             try:
-                profile = self.generate_household_profile(
-                    household_code, start_year, start_month, end_year, end_month
+                basic_info = basic_infos.get(household_code)
+                if not basic_info:
+                    self.logger.warning(f"无法获取户 {household_code} 的基础信息")
+                    continue
+
+                income_expense_data = ledgers.get(household_code)
+                if not income_expense_data:
+                    self.logger.warning(f"户 {household_code} 无收支数据")
+                    continue
+
+                profile = self._build_profile_from_data(
+                    household_code, basic_info,
+                    category_summaries.get(household_code, []),
+                    monthly_summaries.get(household_code, []),
+                    income_expense_data,
+                    aggregates.get(household_code),
+                    start_year, start_month, end_year, end_month
                 )
                 if profile:
                     profiles[household_code] = profile
@@ -448,14 +673,14 @@ class ConsumptionProfileEngine:
 
         return profiles
 
-    def _analyze_consumption_habits(self, category_summary: List[Dict],
+    def _analyze_consumption_habits(self, expense_rows: List[Dict],
                                   monthly_summary: List[Dict],
                                   income_expense_data: List[Dict]) -> Dict:
         """
         分析消费习惯详情
 
         Args:
-            category_summary: 分类汇总数据
+            expense_rows: 分类汇总数据中的支出记录（收支类型为2）
             monthly_summary: 月度汇总数据
             income_expense_data: 收支明细数据
 
@@ -466,9 +691,7 @@ class ConsumptionProfileEngine:
             habits = {}
 
             # 分析各类消费的频次和平均金额
-            expense_data = [item for item in category_summary if item['收支类型'] == 2]
-
-            for item in expense_data:
+            for item in expense_rows:
                 category = item.get('项目名称', '未知类别')
                 total_amount = item.get('总金额', 0)
                 count = item.get('记录数', 0)
@@ -494,78 +717,33 @@ class ConsumptionProfileEngine:
             self.logger.error(f"分析消费习惯失败: {e}")
             return {}
 
-    def _analyze_detailed_consumption_structure(self, category_summary: List[Dict]) -> Dict:
+    def _analyze_detailed_consumption_structure(self, consumption_amounts: Dict[str, float]) -> Dict:
         """
         分析详细消费结构，按照标准消费支出编码（31-38）分类
 
         Args:
-            category_summary: 分类汇总数据
+            consumption_amounts: 标准消费分类金额（见 _compute_batch_aggregates，已按金额降序）
 
         Returns:
             详细消费结构字典
         """
         try:
-            # 标准消费支出类型映射
-            consumption_categories = {
-                '31': '食品烟酒',
-                '32': '衣着',
-                '33': '居住',
-                '34': '生活用品及服务',
-                '35': '交通通信',
-                '36': '教育文化娱乐',
-                '37': '医疗保健',
-                '38': '其他用品及服务'
-            }
+            total_amount = sum(consumption_amounts.values())
 
-            # 初始化结构
-            structure = {category: 0.0 for category in consumption_categories.values()}
-            structure['其他消费'] = 0.0  # 用于不在标准分类中的支出
-
-            # 按支出类别统计
-            expense_data = [item for item in category_summary if item['收支类型'] == 2]
-
-            for item in expense_data:
-                # 从数据访问层获取的是编码前缀（已经是前两位）
-                code_prefix = str(item.get('编码前缀', ''))
-                amount = float(item.get('总金额', 0))
-
-                if amount <= 0:
-                    continue
-
-                # 根据编码前缀分类
-                if code_prefix in consumption_categories:
-                    category_name = consumption_categories[code_prefix]
-                    structure[category_name] += amount
-                else:
-                    # 不在标准分类中的支出归入"其他消费"
-                    structure['其他消费'] += amount
-
-            # 移除金额为0的类别
-            structure = {k: v for k, v in structure.items() if v > 0}
-
-            # 计算总金额和占比
-            total_amount = sum(structure.values())
-
-            # 构建详细结果
-            detailed_structure = {
-                'categories': [],
+            # 构建详细结果，按金额排序并添加占比信息
+            return {
+                'categories': [
+                    {
+                        'name': category,
+                        'amount': amount,
+                        'percentage': (amount / total_amount * 100) if total_amount > 0 else 0
+                    }
+                    for category, amount in consumption_amounts.items()
+                ],
                 'total_expenditure': total_amount,
-                'category_count': len(structure)
+                'category_count': len(consumption_amounts)
             }
 
-            # 按金额排序并添加占比信息
-            sorted_categories = sorted(structure.items(), key=lambda x: x[1], reverse=True)
-
-            for category, amount in sorted_categories:
-                percentage = (amount / total_amount * 100) if total_amount > 0 else 0
-                detailed_structure['categories'].append({
-                    'name': category,
-                    'amount': amount,
-                    'percentage': percentage
-                })
-
-            return detailed_structure
-
         except Exception as e:
             self.logger.error(f"分析详细消费结构失败: {e}")
             return {
@@ -1,16 +1,24 @@
 import pandas as pd
+from src.query_service import bump_data_version
+
+# 未编码数据中按分类类型存储的文本列
+UNCODED_CATEGORY_COLUMNS = ('户代码', '户主姓名', 'type_name')
 
 class DataProcessor:
     def __init__(self, db):
         self.db = db
 
     def update_note(self, year, month):
+        # WHERE 条件与部分索引 IX_main_table_pending_note 的谓词一致，只定位尚未处理的记录
         sql = "UPDATE 调查点台账合并 SET note=COALESCE(note,'') || COALESCE(type_name,''), ybz='1' WHERE year=? AND month=? AND ybz<>'1'"
         with self.db.pool.get_cursor() as cursor:
             cursor.execute(sql, (year, month))
             # 事务会在上下文管理器退出时自动提交
+        # 台账内容已变更，使按数据版本缓存的统计与画像结果失效
+        bump_data_version()
 
     def get_uncoded_data(self, year, month):
+        """查询指定年月有品名但未编码的台账记录（当前应用内没有调用方）"""
         sql = """
         SELECT 调查点户名单.户代码, 调查点户名单.户主姓名, 调查点台账合并.type_name, 调查点台账合并.amount AS 数量, 调查点台账合并.[date] as 日期,
                调查点台账合并.money AS 金额, 调查点台账合并.note AS 备注, 调查点台账合并.type AS 收支, 调查点台账合并.id, 调查点台账合并.code
@@ -22,10 +30,17 @@ class DataProcessor:
         """
         # 使用连接池执行查询，避免连接冲突
         try:
-            result = self.db.execute_query_safe(sql, (year, month))
-            # 将结果转换为DataFrame
             columns = ['户代码', '户主姓名', 'type_name', '数量', '日期', '金额', '备注', '收支', 'id', 'code']
-            return pd.DataFrame(result, columns=columns)
+            # 按批流式读取（普通元组行），每批直接转为DataFrame，不再先 fetchall 全部 sqlite3.Row 对象
+            frames = [
+                pd.DataFrame(batch, columns=columns)
+                for batch in self.db.execute_query_stream(sql, (year, month))
+            ]
+            if not frames:
+                return pd.DataFrame(columns=columns)
+            df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            # 户代码/户主姓名/品名重复度高，转为分类类型后每个取值只保存一份字符串
+            return df.astype({col: 'category' for col in UNCODED_CATEGORY_COLUMNS})
         except Exception as e:
             # 记录错误并重新抛出
             print(f"查询执行失败: {str(e)}")
@@ -37,18 +52,17 @@ class DataProcessor:
 
     def update_all_note(self):
         """更新所有记录的note字段"""
+        # 只改写 note 与 type_name 不同的记录，重复执行时不再重写整表
         sql = """
         UPDATE 调查点台账合并
-        SET note = CASE
-            WHEN type_name IS NOT NULL AND TRIM(type_name) <> ''
-            THEN type_name
-            ELSE note
-        END
+        SET note = type_name
         WHERE type_name IS NOT NULL AND TRIM(type_name) <> ''
+            AND note IS NOT type_name
         """
         with self.db.pool.get_cursor() as cursor:
             cursor.execute(sql)
             # 事务会在上下文管理器退出时自动提交
+        bump_data_version()
 
 
 
@@ -1,8 +1,56 @@
-import pandas as pd
 import logging
-import gc
+import os
+from functools import lru_cache
+import pandas as pd
 from .database_pool import get_connection_pool
 
+# import_data 每批 executemany 的行数，可通过环境变量 IMPORT_BATCH_SIZE 调整
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 10000))
+
+# import_data 已知目标表的建表语句，模块加载时构建一次，导入时按表名直接取用
+KNOWN_TABLE_CREATE_SQL = {
+    '已经编码完成': (
+        "CREATE TABLE [已经编码完成] ("
+        "[户代码] TEXT NULL, [户主姓名] TEXT NULL, [type_name] TEXT NULL, "
+        "[数量] TEXT NULL, [日期] TEXT NULL, [金额] TEXT NULL, "
+        "[备注] TEXT NULL, [收支] TEXT NULL, [id] INTEGER NOT NULL, "
+        "[code] TEXT NULL, [年度] TEXT NULL, [月份] TEXT NULL)"
+    ),
+    '国家点待导入': (
+        "CREATE TABLE [国家点待导入] ("
+        "[SID] TEXT NULL, [县码] TEXT NULL, [样本编码] TEXT NULL, "
+        "[年] TEXT NULL, [月] TEXT NULL, [页码] TEXT NULL, "
+        "[行码] TEXT NULL, [编码] TEXT NULL, [数量] REAL NULL, [金额] REAL NULL, "
+        "[数量2] REAL NULL, [人码] TEXT NULL, [是否网购] TEXT NULL, "
+        "[记账方式] TEXT NULL, [品名] TEXT NULL, [问题类型] TEXT NULL, "
+        "[记账说明] TEXT NULL, [记账审核说明] TEXT NULL, [记账日期] TEXT NULL, "
+        "[创建时间] TEXT NULL, [更新时间] TEXT NULL, [账页生成设备标识] TEXT NULL, "
+        "[人代码] TEXT NULL)"
+    ),
+}
+
+# ensure_performance_indexes 维护的性能索引：(索引名, 建索引语句)，模块加载时构建一次；
+# 在 SQLite 中使用 CREATE INDEX IF NOT EXISTS 简化处理
+PERFORMANCE_INDEXES = (
+    ("IX_main_table_id", "CREATE INDEX IF NOT EXISTS IX_main_table_id ON 调查点台账合并(id)"),
+    ("IX_main_table_code", "CREATE INDEX IF NOT EXISTS IX_main_table_code ON 调查点台账合并(code)"),
+    ("IX_main_table_hudm", "CREATE INDEX IF NOT EXISTS IX_main_table_hudm ON 调查点台账合并(hudm)"),
+    ("IX_main_table_year_month", "CREATE INDEX IF NOT EXISTS IX_main_table_year_month ON 调查点台账合并(year, month)"),
+    # 覆盖索引：分户/区域分析按 hudm + 年月区间查询，汇总所需字段均可直接从索引读取
+    ("IX_main_table_hudm_period_cover",
+     "CREATE INDEX IF NOT EXISTS IX_main_table_hudm_period_cover ON 调查点台账合并(hudm, year, month, type, code, money)"),
+    # 表达式索引：按村代码（hudm 前12位）筛选台账，村/乡镇筛选由全表扫描变为索引查找
+    ("IX_main_table_village_code",
+     "CREATE INDEX IF NOT EXISTS IX_main_table_village_code ON 调查点台账合并(SUBSTR(hudm, 1, 12), hudm)"),
+    # 部分索引：备注回填（update_note）只扫描对应年月中 ybz 未置位的记录
+    ("IX_main_table_pending_note",
+     "CREATE INDEX IF NOT EXISTS IX_main_table_pending_note ON 调查点台账合并(year, month) WHERE ybz <> '1'"),
+    # 表达式索引：区域分析按户代码前12位（村代码）筛选户名单
+    ("IX_household_village_code",
+     "CREATE INDEX IF NOT EXISTS IX_household_village_code ON 调查点户名单(SUBSTR(户代码, 1, 12))"),
+    ("IX_coding_table_code", "CREATE INDEX IF NOT EXISTS IX_coding_table_code ON 调查品种编码(帐目编码)")
+)
+
 class Database:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -54,17 +102,87 @@ class Database:
                     cursor.execute(query)
                 
                 result = cursor.fetchall()
-                
-                # 对大结果集进行垃圾回收
+
+                # 不再对大结果集强制 gc.collect()（全堆扫描会阻塞请求），结果行随引用释放自然回收；
+                # 确实很大的结果集应改用 execute_query_stream 分批读取
                 if len(result) > 1000:
-                    gc.collect()
-                
+                    self.logger.debug(f"安全查询返回 {len(result)} 行")
+
                 return result
         except Exception as e:
             self.logger.error(f"安全查询失败: {query[:100]}... - {e}")
             raise
 
+    def execute_query_stream(self, query, params=None, batch_size=10000):
+        """
+        以批次流式返回SELECT查询结果，适用于大结果集。
+        行以普通元组返回（游标级关闭 sqlite3.Row 行工厂，减少逐行对象开销），
+        使用 fetchmany 分批读取，避免 fetchall 一次性构建整个结果列表。
+
+        Args:
+            query (str): 要执行的SQL SELECT查询。
+            params (tuple, optional): 查询参数. Defaults to None.
+            batch_size (int): 每批行数. Defaults to 10000.
+
+        Yields:
+            list: 每批结果行（元组）列表。
+        """
+        try:
+            with self.pool.get_cursor() as cursor:
+                cursor.row_factory = None
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield batch
+        except Exception as e:
+            self.logger.error(f"流式查询失败: {query[:100]}... - {e}")
+            raise
+
+    def iter_query(self, query, params=None, batch_size=5000):
+        """
+        逐行迭代SELECT查询结果，内部按 batch_size 分批 fetchmany。
+        适用于只遍历一次结果的调用方：任一时刻只持有一批行，而不是 fetchall 的整个结果列表。
 
+        Args:
+            query (str): 要执行的SQL SELECT查询。
+            params (tuple, optional): 查询参数. Defaults to None.
+            batch_size (int): 每批读取的行数. Defaults to 5000.
+
+        Yields:
+            tuple: 结果行（普通元组）。
+        """
+        for batch in self.execute_query_stream(query, params, batch_size):
+            yield from batch
+
+    def query_dataframe(self, query, params=None):
+        """
+        执行SELECT查询并直接返回DataFrame。
+        借用连接池中的原始连接交给 pd.read_sql 读取，
+        不再先 fetchall 成 sqlite3.Row 列表、再逐行转换后重建DataFrame。
+
+        Args:
+            query (str): 要执行的SQL SELECT查询，列名取自查询中的别名。
+            params (list|tuple, optional): 查询参数. Defaults to None.
+
+        Returns:
+            pandas.DataFrame: 查询结果（无结果时为仅含列名的空表）。
+        """
+        conn = None
+        try:
+            conn = self.pool.get_connection()
+            return pd.read_sql(query, conn, params=params)
+        except Exception as e:
+            self.logger.error(f"DataFrame查询失败: {query[:100]}... - {e}")
+            raise
+        finally:
+            if conn:
+                self.pool.return_connection(conn)
 
     def import_data(self, df, table_name):
         """
@@ -74,58 +192,42 @@ class Database:
         
         try:
             with self.pool.get_cursor() as cursor:
+                # 删表、建表和插入放在同一个写事务中：整批只提交一次，
+                # 插入失败时回滚，旧表原样保留，不会留下空表
+                cursor.execute("BEGIN IMMEDIATE")
+
                 # 1. 清理旧表
                 # 兼容SQLite：使用 DROP TABLE IF EXISTS
                 cursor.execute(f"DROP TABLE IF EXISTS [{table_name}]")
                 self.logger.info(f"已清理旧表: {table_name}")
 
-                # 2. 根据表名创建新表
-                if table_name == '已经编码完成':
-                    create_table_sql = """
-                    CREATE TABLE [已经编码完成] (
-                        [户代码] TEXT NULL, [户主姓名] TEXT NULL, [type_name] TEXT NULL,
-                        [数量] TEXT NULL, [日期] TEXT NULL, [金额] TEXT NULL,
-                        [备注] TEXT NULL, [收支] TEXT NULL, [id] INTEGER NOT NULL,
-                        [code] TEXT NULL, [年度] TEXT NULL, [月份] TEXT NULL
-                    )"""
-                elif table_name == '国家点待导入':
-                    create_table_sql = """
-                    CREATE TABLE [国家点待导入] (
-                        [SID] TEXT NULL, [县码] TEXT NULL, [样本编码] TEXT NULL,
-                        [年] TEXT NULL, [月] TEXT NULL, [页码] TEXT NULL,
-                        [行码] TEXT NULL, [编码] TEXT NULL, [数量] REAL NULL, [金额] REAL NULL,
-                        [数量2] REAL NULL, [人码] TEXT NULL, [是否网购] TEXT NULL,
-                        [记账方式] TEXT NULL, [品名] TEXT NULL, [问题类型] TEXT NULL,
-                        [记账说明] TEXT NULL, [记账审核说明] TEXT NULL, [记账日期] TEXT NULL,
-                        [创建时间] TEXT NULL, [更新时间] TEXT NULL, [账页生成设备标识] TEXT NULL,
-                        [人代码] TEXT NULL
-                    )"""
-                else:
+                # 2. 根据表名创建新表：已知表使用模块级预置建表语句，其余表按列名生成
+                create_table_sql = KNOWN_TABLE_CREATE_SQL.get(table_name)
+                if create_table_sql is None:
                     columns = ', '.join([f"[{col}] TEXT" for col in df.columns])
                     create_table_sql = f"CREATE TABLE [{table_name}] ({columns})"
                 
                 cursor.execute(create_table_sql)
                 self.logger.info(f"表 {table_name} 创建成功")
 
-                # 3. 准备并执行批量插入
-                df_prepared = df.astype(object).where(pd.notna(df), None)
-                batch_data = [tuple(row) for row in df_prepared.itertuples(index=False)]
-
-                if not batch_data:
+                # 3. 准备并执行批量插入（逐列转换，不再生成整表 object 副本和同尺寸掩码）
+                if len(df) == 0:
                     self.logger.info("没有数据需要导入。")
                     return {'successful_rows': 0, 'failed_rows': 0, 'total_rows': 0}
 
-                placeholders = ', '.join(['?'] * len(df.columns))
-                insert_sql = f"INSERT INTO [{table_name}] ({', '.join(f'[{col}]' for col in df.columns)}) VALUES ({placeholders})"
+                insert_sql = self._insert_sql(table_name, tuple(df.columns))
                 
                 # 兼容不同驱动：pyodbc/sqlserver 有 fast_executemany，sqlite3 无此属性
                 try:
                     cursor.fast_executemany = True
                 except Exception:
                     pass
-                cursor.executemany(insert_sql, batch_data)
-                
-                successful_rows = cursor.rowcount if cursor.rowcount != -1 else len(batch_data)
+                # 按固定批次逐块转换并插入：同一时刻只持有一批的 Python 值，峰值内存与批次大小相关而非整表
+                successful_rows = 0
+                for start in range(0, len(df), IMPORT_BATCH_SIZE):
+                    batch = df.iloc[start:start + IMPORT_BATCH_SIZE]
+                    cursor.executemany(insert_sql, self._rows_for_insert(batch))
+                    successful_rows += cursor.rowcount if cursor.rowcount != -1 else len(batch)
                 self.logger.info(f"数据导入完成 - 成功: {successful_rows} 行")
 
                 return {
@@ -139,23 +241,56 @@ class Database:
             # 异常将在 get_cursor 上下文管理器中被处理（回滚等）
             raise
 
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _insert_sql(table_name, columns):
+        """按表名和列名元组生成INSERT语句；同一表结构重复导入时直接复用缓存的语句"""
+        column_list = ', '.join(f'[{col}]' for col in columns)
+        placeholders = ', '.join(['?'] * len(columns))
+        return f"INSERT INTO [{table_name}] ({column_list}) VALUES ({placeholders})"
+
+    @staticmethod
+    def _rows_for_insert(df):
+        """
+        将DataFrame转为插入用的参数元组迭代器，缺失值（NaN/NaT/None）转为 None。
+        每列取一次 Python 值列表，仅对含缺失值的列再按掩码替换。
+        """
+        columns = []
+        for name in df.columns:
+            series = df[name]
+            values = series.tolist()
+            if series.hasnans:
+                values = [None if missing else value for value, missing in zip(values, series.isna().to_numpy())]
+            columns.append(values)
+        return zip(*columns)
+
     def ensure_performance_indexes(self):
         """确保关键表有必要的性能索引"""
         self.logger.info("开始检查和创建性能索引（SQLite 兼容）")
-        # 在 SQLite 中使用 CREATE INDEX IF NOT EXISTS 简化处理
-        sqlite_index_sqls = [
-            "CREATE INDEX IF NOT EXISTS IX_main_table_id ON 调查点台账合并(id)",
-            "CREATE INDEX IF NOT EXISTS IX_main_table_code ON 调查点台账合并(code)",
-            "CREATE INDEX IF NOT EXISTS IX_main_table_hudm ON 调查点台账合并(hudm)",
-            "CREATE INDEX IF NOT EXISTS IX_main_table_year_month ON 调查点台账合并(year, month)",
-            "CREATE INDEX IF NOT EXISTS IX_coding_table_code ON 调查品种编码(帐目编码)"
-        ]
-        for sql in sqlite_index_sqls:
-            try:
-                with self.pool.get_cursor() as cursor:
-                    cursor.execute(sql)
-            except Exception as e:
-                self.logger.warning(f"创建索引失败（可能已存在或表不存在）: {sql} - {e}")
+
+        # 整个检查/建索引过程只借用一个连接：先一次查询取出已存在的索引名，
+        # 再在同一游标、同一事务中只为缺失的索引执行建索引语句，单条失败不影响其余索引
+        try:
+            with self.pool.get_cursor() as cursor:
+                try:
+                    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+                    existing = {row[0] for row in cursor.fetchall()}
+                except Exception as e:
+                    self.logger.warning(f"读取已有索引列表失败，将逐一尝试创建: {e}")
+                    existing = set()
+
+                missing = [(index_name, sql) for index_name, sql in PERFORMANCE_INDEXES if index_name not in existing]
+                if not missing:
+                    return
+                # 缺失的索引在同一个显式事务中创建，退出上下文时只提交一次（WAL 只同步一次）
+                cursor.execute("BEGIN IMMEDIATE")
+                for index_name, sql in missing:
+                    try:
+                        cursor.execute(sql)
+                    except Exception as e:
+                        self.logger.warning(f"创建索引失败（可能已存在或表不存在）: {sql} - {e}")
+        except Exception as e:
+            self.logger.warning(f"检查和创建性能索引失败: {e}")
 
     def optimize_table_statistics(self, table_name):
         """优化SQLite统计信息（替代 SQL Server 的 UPDATE STATISTICS）"""
@@ -176,14 +311,25 @@ class Database:
 
 
     def check_table_has_identity_column(self, table_name: str) -> bool:
-        """检测指定表是否存在标识（IDENTITY）列"""
+        """
+        检测指定表是否存在标识（自增）列。
+        SQLite 中对应单列 INTEGER PRIMARY KEY（rowid 别名）；
+        使用 EXISTS 探测，命中第一行即返回，不再 COUNT(*) 汇总。
+        """
         try:
             with self.pool.get_cursor() as cursor:
                 cursor.execute(
-                    "SELECT COUNT(*) FROM sys.columns WHERE object_id = OBJECT_ID(?) AND is_identity = 1",
-                    (table_name,)
+                    """
+                    SELECT EXISTS(
+                        SELECT 1 FROM pragma_table_info(?)
+                        WHERE pk = 1 AND UPPER(type) = 'INTEGER'
+                    ) AND NOT EXISTS(
+                        SELECT 1 FROM pragma_table_info(?) WHERE pk > 1
+                    )
+                    """,
+                    (table_name, table_name)
                 )
-                return (cursor.fetchone()[0] or 0) > 0
+                return bool(cursor.fetchone()[0])
         except Exception as e:
             self.logger.warning(f"检查表标识列失败 {table_name}: {e}")
             return False
\ No newline at end of file
@@ -4,7 +4,7 @@ SQLite数据库连接池模块
 import sqlite3
 import os
 import logging
-from queue import Queue, Empty, Full
+from queue import SimpleQueue, Empty
 from contextlib import contextmanager
 import threading
 
@@ -18,9 +18,10 @@ class ConnectionPool:
         self.max_connections = max_connections
         self.timeout = timeout
         self.pool_name = pool_name
-        self._pool = Queue(max_connections)
+        # 空闲连接放在无锁的 SimpleQueue 中，容量由信号量控制：取连接先占一个名额，归还后释放
+        self._pool = SimpleQueue()
+        self._available = threading.BoundedSemaphore(max_connections)
         self._lock = threading.Lock()
-        self._connections_in_use = 0
         self._total_connections = 0
         self.db_path = os.path.abspath(db_path)
         self._initialize_pool()
@@ -43,8 +44,9 @@ class ConnectionPool:
             connection.execute("PRAGMA foreign_keys = ON")  # 启用外键约束
             connection.execute("PRAGMA journal_mode = WAL")  # 使用WAL模式提高并发性能
             connection.execute("PRAGMA synchronous = NORMAL")  # 平衡性能和安全性
-            connection.execute("PRAGMA cache_size = 10000")  # 增加缓存大小
+            connection.execute("PRAGMA cache_size = -65536")  # 页缓存上限 64MB（负值按 KiB 计，按需增长）
             connection.execute("PRAGMA temp_store = MEMORY")  # 临时表存储在内存中
+            connection.execute("PRAGMA mmap_size = 268435456")  # 内存映射读取最多 256MB，减少 read() 系统调用和页拷贝
             
             # 设置行工厂，使结果可以通过列名访问
             connection.row_factory = sqlite3.Row
@@ -69,56 +71,48 @@ class ConnectionPool:
 
     def get_connection(self):
         """从连接池获取一个连接"""
+        if not self._available.acquire(timeout=self.timeout):
+            self.logger.error(f"[{self.pool_name}] 获取连接超时")
+            raise Exception("获取数据库连接超时")
         try:
-            with self._lock:
-                self._connections_in_use += 1
-            
-            conn = self._pool.get(timeout=self.timeout)
-            
-            # 测试连接是否有效
+            # 本地文件连接几乎不会失效，取用时不再执行 SELECT 1 探测；
+            # 已关闭的连接在归还时检测并替换（见 return_connection）
+            return self._pool.get_nowait()
+        except Empty:
+            # 名额内但没有空闲连接（此前有连接归还失败被丢弃），补建一个
             try:
-                conn.execute("SELECT 1").fetchone()
-            except sqlite3.Error:
-                # 连接无效，创建新连接
-                self.logger.warning(f"[{self.pool_name}] 检测到无效连接，正在重新创建")
-                conn.close()
                 conn = self._create_connection()
-            
-            return conn
-        except Empty:
-            self.logger.error(f"[{self.pool_name}] 获取连接超时")
-            raise Exception("获取数据库连接超时")
-        except Exception as e:
-            with self._lock:
-                self._connections_in_use -= 1
-            self.logger.error(f"[{self.pool_name}] 获取连接失败: {e}")
-            raise
+                with self._lock:
+                    self._total_connections += 1
+                return conn
+            except Exception as e:
+                self._available.release()
+                self.logger.error(f"[{self.pool_name}] 获取连接失败: {e}")
+                raise
 
     def return_connection(self, conn):
         """将连接返回到连接池"""
+        if not conn:
+            return
         try:
-            if conn:
-                # 回滚任何未提交的事务
-                try:
-                    conn.rollback()
-                except sqlite3.Error:
-                    pass
-                
-                self._pool.put(conn, timeout=1)
-            
-            with self._lock:
-                self._connections_in_use -= 1
-        except Full:
-            # 连接池已满，关闭连接
-            conn.close()
-            with self._lock:
-                self._total_connections -= 1
+            # 回滚任何未提交的事务；连接已关闭时换成新连接再放回池中
+            try:
+                conn.rollback()
+            except sqlite3.ProgrammingError:
+                self.logger.warning(f"[{self.pool_name}] 检测到无效连接，正在重新创建")
+                conn = self._create_connection()
+            except sqlite3.Error:
+                pass
+
+            self._pool.put(conn)
         except Exception as e:
+            # 连接丢弃，下次取用时在名额内补建
             self.logger.error(f"[{self.pool_name}] 返回连接失败: {e}")
-            if conn:
-                conn.close()
+            conn.close()
             with self._lock:
-                self._connections_in_use -= 1
+                self._total_connections -= 1
+        finally:
+            self._available.release()
 
     @contextmanager
     def get_cursor(self):
@@ -144,28 +138,30 @@ class ConnectionPool:
     def close_all(self):
         """关闭所有连接"""
         self.logger.info(f"[{self.pool_name}] 正在关闭所有数据库连接...")
-        while not self._pool.empty():
+        # 直接 get_nowait 直到队列为空，不再每轮先调用 empty() 探测
+        while True:
             try:
                 conn = self._pool.get_nowait()
-                conn.close()
             except Empty:
                 break
+            try:
+                conn.close()
             except Exception as e:
                 self.logger.error(f"[{self.pool_name}] 关闭连接时出错: {e}")
         
         with self._lock:
             self._total_connections = 0
-            self._connections_in_use = 0
         
         self.logger.info(f"[{self.pool_name}] 所有连接已关闭")
 
     def get_stats(self):
         """获取连接池统计信息"""
         with self._lock:
+            available = self._pool.qsize()
             return {
                 'total_connections': self._total_connections,
-                'connections_in_use': self._connections_in_use,
-                'available_connections': self._pool.qsize(),
+                'connections_in_use': self._total_connections - available,
+                'available_connections': available,
                 'max_connections': self.max_connections
             }
 
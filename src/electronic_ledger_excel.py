@@ -6,10 +6,60 @@
 
 import os
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
 import logging
-from src.utils import sanitize_filename
+from src.utils import sanitize_filename, register_named_style, apply_named_style
+
+
+# 各工作表列宽（列字母 -> 宽度）
+SUMMARY_COLUMN_WIDTHS = {
+    'A': 15,  # 户代码
+    'B': 12,  # 户主姓名
+    'C': 12,  # 收入
+    'D': 12,  # 支出
+    'E': 10,  # 记账笔数
+    'F': 12   # 漏记账天数
+}
+
+DETAIL_COLUMN_WIDTHS = {
+    'A': 15,  # 户代码
+    'B': 12,  # 户主姓名
+    'C': 10,  # 编码
+    'D': 10,  # 数量
+    'E': 12,  # 金额
+    'F': 12,  # 日期
+    'G': 10,  # 收支类型
+    'H': 10,  # ID
+    'I': 20,  # 类型名称
+    'J': 12   # 单位名称
+}
+
+CONSUMPTION_COLUMN_WIDTHS = {
+    'A': 15,  # 户代码
+    'B': 12,  # 户主姓名
+    'C': 10,  # 编码
+    'D': 25,  # 帐目指标名称
+    'E': 12,  # 总金额
+    'F': 10   # 记账笔数
+}
+
+# 通用单元格样式：模块加载时构建一次
+BODY_FONT = Font(name='宋体', size=10)
+HEADER_FONT = Font(name='宋体', size=10, bold=True)
+CELL_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+# 表头背景色
+HEADER_FILL = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
+
+# 台账表头、正文的命名样式名称
+HEADER_STYLE_NAME = '台账表头'
+BODY_STYLE_NAME = '台账正文'
 
 
 class ElectronicLedgerExcel:
@@ -55,12 +105,8 @@ class ElectronicLedgerExcel:
             
             self.logger.info(f"开始生成电子台账Excel文件: {file_path}")
             
-            # 创建工作簿
-            workbook = openpyxl.Workbook()
-            
-            # 删除默认工作表
-            if 'Sheet' in workbook.sheetnames:
-                workbook.remove(workbook['Sheet'])
+            # 创建只写模式工作簿：逐行流式写出，不在内存中保留全部单元格对象（无默认工作表）
+            workbook = openpyxl.Workbook(write_only=True)
             
             # 创建三个工作表
             self._create_summary_sheet(workbook, summary_df, "汇总表")
@@ -111,12 +157,8 @@ class ElectronicLedgerExcel:
 
             self.logger.info(f"开始生成电子台账Excel文件: {file_path}")
 
-            # 创建工作簿
-            workbook = openpyxl.Workbook()
-
-            # 删除默认工作表
-            if 'Sheet' in workbook.sheetnames:
-                workbook.remove(workbook['Sheet'])
+            # 创建只写模式工作簿：逐行流式写出，不在内存中保留全部单元格对象（无默认工作表）
+            workbook = openpyxl.Workbook(write_only=True)
 
             # 创建三个工作表
             self._create_summary_sheet(workbook, summary_df, "汇总表")
@@ -136,139 +178,51 @@ class ElectronicLedgerExcel:
     
     def _create_summary_sheet(self, workbook, df, sheet_name):
         """创建汇总表工作表"""
-        worksheet = workbook.create_sheet(sheet_name)
-        
-        # 写入数据
-        for r in dataframe_to_rows(df, index=False, header=True):
-            worksheet.append(r)
-        
-        # 应用格式设置
-        self._apply_summary_formatting(worksheet, df)
+        self._write_sheet(workbook, df, sheet_name, SUMMARY_COLUMN_WIDTHS)
         
     def _create_detail_sheet(self, workbook, df, sheet_name):
         """创建分户详细账工作表"""
-        worksheet = workbook.create_sheet(sheet_name)
-        
-        # 写入数据
-        for r in dataframe_to_rows(df, index=False, header=True):
-            worksheet.append(r)
-        
-        # 应用格式设置
-        self._apply_detail_formatting(worksheet, df)
+        self._write_sheet(workbook, df, sheet_name, DETAIL_COLUMN_WIDTHS)
         
     def _create_consumption_sheet(self, workbook, df, sheet_name):
         """创建分户消费结构工作表"""
+        self._write_sheet(workbook, df, sheet_name, CONSUMPTION_COLUMN_WIDTHS)
+
+    def _write_sheet(self, workbook, df, sheet_name, column_widths):
+        """
+        在只写模式工作簿中创建工作表并逐行写入数据。
+        只写模式下列宽、冻结窗格必须在写入首行前设置，单元格样式在追加时随单元格一起写出。
+        无数据时只写表头，不设置格式。
+        """
         worksheet = workbook.create_sheet(sheet_name)
-        
-        # 写入数据
-        for r in dataframe_to_rows(df, index=False, header=True):
-            worksheet.append(r)
-        
-        # 应用格式设置
-        self._apply_consumption_formatting(worksheet, df)
-    
-    def _apply_summary_formatting(self, worksheet, df):
-        """应用汇总表格式设置"""
-        if df.empty:
-            return
-            
-        # 设置列宽
-        column_widths = {
-            'A': 15,  # 户代码
-            'B': 12,  # 户主姓名
-            'C': 12,  # 收入
-            'D': 12,  # 支出
-            'E': 10,  # 记账笔数
-            'F': 12   # 漏记账天数
-        }
-        
-        for col, width in column_widths.items():
-            worksheet.column_dimensions[col].width = width
-        
-        # 应用通用格式
-        self._apply_common_formatting(worksheet, len(df) + 1)
-    
-    def _apply_detail_formatting(self, worksheet, df):
-        """应用分户详细账格式设置"""
-        if df.empty:
-            return
-            
-        # 设置列宽
-        column_widths = {
-            'A': 15,  # 户代码
-            'B': 12,  # 户主姓名
-            'C': 10,  # 编码
-            'D': 10,  # 数量
-            'E': 12,  # 金额
-            'F': 12,  # 日期
-            'G': 10,  # 收支类型
-            'H': 10,  # ID
-            'I': 20,  # 类型名称
-            'J': 12   # 单位名称
-        }
-        
-        for col, width in column_widths.items():
-            worksheet.column_dimensions[col].width = width
-        
-        # 应用通用格式
-        self._apply_common_formatting(worksheet, len(df) + 1)
-    
-    def _apply_consumption_formatting(self, worksheet, df):
-        """应用分户消费结构格式设置"""
+        header = list(df.columns)
+
         if df.empty:
+            worksheet.append(header)
             return
-            
-        # 设置列宽
-        column_widths = {
-            'A': 15,  # 户代码
-            'B': 12,  # 户主姓名
-            'C': 10,  # 编码
-            'D': 25,  # 帐目指标名称
-            'E': 12,  # 总金额
-            'F': 10   # 记账笔数
-        }
-        
+
+        # 设置列宽并冻结首行
         for col, width in column_widths.items():
             worksheet.column_dimensions[col].width = width
-        
-        # 应用通用格式
-        self._apply_common_formatting(worksheet, len(df) + 1)
-    
-    def _apply_common_formatting(self, worksheet, max_row):
-        """应用通用格式设置"""
-        # 字体设置
-        font = Font(name='宋体', size=10)
-        header_font = Font(name='宋体', size=10, bold=True)
-        
-        # 对齐设置
-        alignment = Alignment(horizontal='center', vertical='center')
-        
-        # 边框设置
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # 表头背景色
-        header_fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
-        
-        # 应用格式到所有单元格
-        for row in range(1, max_row + 1):
-            for col in range(1, worksheet.max_column + 1):
-                cell = worksheet.cell(row=row, column=col)
-                
-                # 设置字体
-                if row == 1:  # 表头
-                    cell.font = header_font
-                    cell.fill = header_fill
-                else:
-                    cell.font = font
-                
-                # 设置对齐和边框
-                cell.alignment = alignment
-                cell.border = thin_border
-        
-        # 冻结首行
         worksheet.freeze_panes = 'A2'
+
+        # 表头、正文各登记一个命名样式（赋值时需求哈希并查找索引，每个工作簿只做一次），
+        # 各行单元格按名称套用
+        header_style = register_named_style(workbook, HEADER_STYLE_NAME, HEADER_FONT, CELL_ALIGNMENT,
+                                            THIN_BORDER, HEADER_FILL)
+        body_style = register_named_style(workbook, BODY_STYLE_NAME, BODY_FONT, CELL_ALIGNMENT, THIN_BORDER)
+
+        # 写入表头和数据行；itertuples(name=None) 直接产出普通元组
+        worksheet.append(self._styled_row(worksheet, header, header_style))
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append(self._styled_row(worksheet, row, body_style))
+
+    @staticmethod
+    def _styled_row(worksheet, values, style_name):
+        """将一行值包装为只写单元格并套用命名样式（保留日期等数字格式）"""
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            apply_named_style(cell, style_name)
+            cells.append(cell)
+        return cells
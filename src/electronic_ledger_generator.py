@@ -143,12 +143,9 @@ class ElectronicLedgerGenerator:
             else:
                 query_params = [year, month] + code_param
 
-            result = self.db.execute_query_safe(sql, query_params)
-            if result:
-                columns = ['户代码', '户主姓名', '收入', '支出', '记账笔数', '漏记账天数']
-                # 将pyodbc.Row对象转换为列表
-                data = [list(row) for row in result]
-                df = pd.DataFrame(data, columns=columns)
+            # 直接由 pd.read_sql 构建DataFrame，列名取自查询别名
+            df = self.db.query_dataframe(sql, query_params)
+            if not df.empty:
                 self.logger.info(f"汇总表生成成功，共 {len(df)} 户")
                 return df
             else:
@@ -206,12 +203,9 @@ class ElectronicLedgerGenerator:
             else:
                 query_params = [year, month] + code_param
 
-            result = self.db.execute_query_safe(sql, query_params)
-            if result:
-                columns = ['户代码', '户主姓名', '编码', '数量', '金额', '日期', '收支类型', 'ID', '类型名称', '单位名称']
-                # 将pyodbc.Row对象转换为列表
-                data = [list(row) for row in result]
-                df = pd.DataFrame(data, columns=columns)
+            # 直接由 pd.read_sql 构建DataFrame，列名取自查询别名
+            df = self.db.query_dataframe(sql, query_params)
+            if not df.empty:
                 self.logger.info(f"分户详细账生成成功，共 {len(df)} 条记录")
                 return df
             else:
@@ -267,12 +261,9 @@ class ElectronicLedgerGenerator:
             else:
                 query_params = [year, month] + code_param
 
-            result = self.db.execute_query_safe(sql, query_params)
-            if result:
-                columns = ['户代码', '户主姓名', '编码', '帐目指标名称', '总金额', '记账笔数']
-                # 将pyodbc.Row对象转换为列表
-                data = [list(row) for row in result]
-                df = pd.DataFrame(data, columns=columns)
+            # 直接由 pd.read_sql 构建DataFrame，列名取自查询别名
+            df = self.db.query_dataframe(sql, query_params)
+            if not df.empty:
                 self.logger.info(f"分户消费结构生成成功，共 {len(df)} 条记录")
                 return df
             else:
@@ -2,8 +2,12 @@ import pandas as pd
 import os
 import openpyxl
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
-from src.utils import sanitize_filename
+from openpyxl.utils import get_column_letter
+from src.utils import sanitize_filename, register_named_style, apply_named_style
+
+# 格式化时登记的命名样式名称
+HEADER_STYLE_NAME = '数据表表头'
+DATA_STYLE_NAME = '数据表正文'
 
 class ExcelOperations:
     @staticmethod
@@ -11,7 +15,7 @@ class ExcelOperations:
         """保存数据到Excel并应用专业格式"""
         # 确保第一列为字符串类型
         if not df.empty:
-            df.iloc[:, 0] = df.iloc[:, 0].astype(str)
+            df.isetitem(0, df.iloc[:, 0].astype(str))
 
         # 使用openpyxl直接操作以获得更好的格式控制
         try:
@@ -26,8 +30,7 @@ class ExcelOperations:
             worksheet = workbook.create_sheet(sheet_name)
 
             # 写入数据
-            for r in dataframe_to_rows(df, index=False, header=True):
-                worksheet.append(r)
+            ExcelOperations._append_dataframe(worksheet, df)
 
             # 应用格式设置
             ExcelOperations._apply_excel_formatting(worksheet, df)
@@ -41,6 +44,13 @@ class ExcelOperations:
             with pd.ExcelWriter(filename, mode='a', engine='openpyxl', if_sheet_exists='replace') as writer:
                 df.to_excel(writer, sheet_name=sheet_name, index=False)
 
+    @staticmethod
+    def _append_dataframe(worksheet, df):
+        """逐行写入表头和数据；itertuples(name=None) 直接产出普通元组，无需逐行构建列表"""
+        worksheet.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append(row)
+
     @staticmethod
     def _apply_excel_formatting(worksheet, df):
         """应用Excel格式设置"""
@@ -63,37 +73,35 @@ class ExcelOperations:
             bottom=Side(style='thin')
         )
 
+        # 单次遍历已有单元格，同时统计各列最大内容长度。
+        # 样式赋值时 openpyxl 需对样式对象求哈希并查找索引，开销远大于单元格定位；
+        # 因此表头、数据各登记一个命名样式，单元格按名称套用，单元格自身的数字格式（如日期）保持不变
+        workbook = worksheet.parent
+        header_style = register_named_style(workbook, HEADER_STYLE_NAME, header_font, header_alignment,
+                                            thin_border, header_fill)
+        data_style = register_named_style(workbook, DATA_STYLE_NAME, data_font, data_alignment, thin_border)
+
+        num_cols = len(df.columns)
+        max_lengths = [0] * num_cols
+        rows_iter = worksheet.iter_rows(min_row=1, max_row=worksheet.max_row, max_col=num_cols)
+
         # 应用表头格式
-        for col in range(1, len(df.columns) + 1):
-            cell = worksheet.cell(row=1, column=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
+        for idx, cell in enumerate(next(rows_iter)):
+            apply_named_style(cell, header_style)
+            max_lengths[idx] = len(str(cell.value))
 
         # 应用数据格式
-        for row in range(2, worksheet.max_row + 1):
-            for col in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row, column=col)
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = thin_border
-
-        # 自动调整列宽
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-
-            # 设置列宽，最小8，最大50
+        for row in rows_iter:
+            for idx, cell in enumerate(row):
+                apply_named_style(cell, data_style)
+                length = len(str(cell.value))
+                if length > max_lengths[idx]:
+                    max_lengths[idx] = length
+
+        # 自动调整列宽，最小8，最大50
+        for idx, max_length in enumerate(max_lengths, start=1):
             adjusted_width = min(max(max_length + 2, 8), 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+            worksheet.column_dimensions[get_column_letter(idx)].width = adjusted_width
 
         # 设置行高
         for row in range(1, worksheet.max_row + 1):
@@ -110,7 +118,7 @@ class ExcelOperations:
         """
         # 确保第一列为字符串类型
         if not df.empty and df.shape[1] > 0:
-            df.iloc[:, 0] = df.iloc[:, 0].astype(str)
+            df.isetitem(0, df.iloc[:, 0].astype(str))
 
         # 创建工作簿并保存数据
         workbook = openpyxl.Workbook()
@@ -118,8 +126,7 @@ class ExcelOperations:
         worksheet.title = sheet_name
 
         # 写入数据
-        for r in dataframe_to_rows(df, index=False, header=True):
-            worksheet.append(r)
+        self._append_dataframe(worksheet, df)
 
         # 应用格式设置
         self._apply_excel_formatting(worksheet, df)
@@ -11,6 +11,9 @@ from typing import List, Dict, Optional
 class HouseholdAnalysisDAL:
     """分户审核分析数据访问层"""
     
+    # 单条 IN 列表的户代码上限（留出时间筛选参数位置，兼容旧版 SQLite 999 个参数限制）
+    IN_CLAUSE_CHUNK_SIZE = 900
+
     def __init__(self, db):
         """
         初始化数据访问层
@@ -31,65 +34,109 @@ class HouseholdAnalysisDAL:
         Returns:
             户基础信息字典，包含户主姓名、人数、村庄信息等
         """
-        try:
-            # 首先尝试从调查点户名单获取基础信息
-            household_sql = """
-            SELECT 户代码, 户主姓名, 人数
-            FROM 调查点户名单
-            WHERE 户代码 = ?
-            """
-            household_result = self.db.execute_query_safe(household_sql, [household_code])
+        return self.get_households_basic_info([household_code]).get(household_code)
 
-            if household_result:
-                # 找到了户名单信息
-                household_info = household_result[0]
-                household_head = household_info[1]
-                family_size = household_info[2] or 0
-            else:
-                # 户名单中没有找到，尝试从台账合并表中获取信息
-                self.logger.info(f"户名单中未找到户代码 {household_code}，尝试从台账表获取信息")
+    def get_households_basic_info(self, household_codes: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取户基础信息（每类数据按分片各查询一次）
 
-                # 检查台账表中是否有该户代码的数据
-                ledger_check_sql = """
-                SELECT COUNT(*) FROM 调查点台账合并 WHERE hudm = ?
-                """
-                ledger_check_result = self.db.execute_query_safe(ledger_check_sql, [household_code])
+        Args:
+            household_codes: 户代码列表
+
+        Returns:
+            户代码到基础信息字典的映射；户名单和台账表中均不存在的户不在结果中
+        """
+        try:
+            codes = list(dict.fromkeys(household_codes))
+            households = {}
 
-                if not ledger_check_result or ledger_check_result[0][0] == 0:
-                    self.logger.warning(f"台账表中也未找到户代码 {household_code} 的数据")
-                    return None
+            # 首先尝试从调查点户名单获取基础信息
+            for chunk in self._chunked(codes):
+                household_sql = f"""
+                SELECT 户代码, 户主姓名, 人数
+                FROM 调查点户名单
+                WHERE 户代码 IN ({self._placeholders(chunk)})
+                """
+                for row in self.db.execute_query_safe(household_sql, chunk):
+                    households.setdefault(row[0], (row[1], row[2] or 0))
+
+            # 户名单中没有找到的户，尝试从台账合并表中获取信息
+            missing = [code for code in codes if code not in households]
+            if missing:
+                self.logger.info(f"户名单中未找到 {len(missing)} 个户代码，尝试从台账表获取信息")
+                for chunk in self._chunked(missing):
+                    ledger_check_sql = f"""
+                    SELECT DISTINCT hudm FROM 调查点台账合并 WHERE hudm IN ({self._placeholders(chunk)})
+                    """
+                    for row in self.db.execute_query_safe(ledger_check_sql, chunk):
+                        # 从台账表构造基本信息：使用户代码后3位作为标识，默认家庭人口为1
+                        households[row[0]] = (f"户主_{row[0][-3:]}", 1)
+
+                not_found = [code for code in missing if code not in households]
+                if not_found:
+                    self.logger.warning(f"台账表中也未找到户代码 {', '.join(not_found[:10])} 等 {len(not_found)} 户的数据")
 
-                # 从台账表构造基本信息
-                household_head = f"户主_{household_code[-3:]}"  # 使用户代码后3位作为标识
-                family_size = 1  # 默认家庭人口为1
-            
             # 通过户代码前12位获取村庄信息（严格使用v_town_village_list视图）
-            village_code = household_code[:12] if len(household_code) >= 12 else None
-            village_info = None
-            
-            if village_code:
-                village_sql = """
+            village_codes = list(dict.fromkeys(code[:12] for code in households if len(code) >= 12))
+            villages = {}
+            for chunk in self._chunked(village_codes):
+                village_sql = f"""
                 SELECT 村代码, 村居名称, 所在乡镇街道
                 FROM v_town_village_list
-                WHERE 村代码 = ?
+                WHERE 村代码 IN ({self._placeholders(chunk)})
                 """
-                village_result = self.db.execute_query_safe(village_sql, [village_code])
-                if village_result:
-                    village_info = village_result[0]
-            
-            return {
-                '户代码': household_code,
-                '户主姓名': household_head,
-                '人数': family_size,
-                '家庭人口': family_size,  # 添加家庭人口字段作为人数的别名
-                '村代码': village_info[0] if village_info else village_code,
-                '村居名称': village_info[1] if village_info else None,
-                '所在乡镇街道': village_info[2] if village_info else None
-            }
-            
+                for row in self.db.execute_query_safe(village_sql, chunk):
+                    villages.setdefault(row[0], row)
+
+            result = {}
+            for code in codes:
+                if code not in households:
+                    continue
+                household_head, family_size = households[code]
+                village_code = code[:12] if len(code) >= 12 else None
+                village_info = villages.get(village_code)
+                result[code] = {
+                    '户代码': code,
+                    '户主姓名': household_head,
+                    '人数': family_size,
+                    '家庭人口': family_size,  # 添加家庭人口字段作为人数的别名
+                    '村代码': village_info[0] if village_info else village_code,
+                    '村居名称': village_info[1] if village_info else None,
+                    '所在乡镇街道': village_info[2] if village_info else None
+                }
+
+            return result
+
         except Exception as e:
-            self.logger.error(f"获取户基础信息失败: {household_code}, 错误: {e}")
-            return None
+            self.logger.error(f"批量获取户基础信息失败: {len(household_codes)} 户, 错误: {e}")
+            return {}
+
+    def _chunked(self, codes: List[str]):
+        """按 IN 列表上限切分户代码"""
+        for start in range(0, len(codes), self.IN_CLAUSE_CHUNK_SIZE):
+            yield codes[start:start + self.IN_CLAUSE_CHUNK_SIZE]
+
+    @staticmethod
+    def _placeholders(values: List) -> str:
+        return ','.join('?' * len(values))
+
+    @staticmethod
+    def _build_time_clause(start_year: str = None, start_month: str = None,
+                           end_year: str = None, end_month: str = None):
+        """构建台账年月区间筛选条件，返回 (以 AND 开头的条件串, 参数列表)"""
+        time_conditions = []
+        params = []
+
+        if start_year and start_month:
+            time_conditions.append("(t.year > ? OR (t.year = ? AND t.month >= ?))")
+            params.extend([start_year, start_year, start_month])
+
+        if end_year and end_month:
+            time_conditions.append("(t.year < ? OR (t.year = ? AND t.month <= ?))")
+            params.extend([end_year, end_year, end_month])
+
+        time_clause = " AND " + " AND ".join(time_conditions) if time_conditions else ""
+        return time_clause, params
     
     def get_household_income_expense_data(self, household_code: str, 
                                         start_year: str = None, start_month: str = None,
@@ -107,67 +154,73 @@ class HouseholdAnalysisDAL:
         Returns:
             收支明细数据列表
         """
+        return self.get_households_income_expense_data(
+            [household_code], start_year, start_month, end_year, end_month
+        ).get(household_code, [])
+
+    def get_households_income_expense_data(self, household_codes: List[str],
+                                         start_year: str = None, start_month: str = None,
+                                         end_year: str = None, end_month: str = None) -> Dict[str, List[Dict]]:
+        """
+        批量获取户收支明细数据
+
+        Args:
+            household_codes: 户代码列表
+            start_year: 开始年份
+            start_month: 开始月份
+            end_year: 结束年份
+            end_month: 结束月份
+
+        Returns:
+            户代码到收支明细数据列表的映射（无数据的户不在结果中）
+        """
         try:
-            # 构建时间筛选条件
-            time_conditions = []
-            params = [household_code]
-            
-            if start_year and start_month:
-                time_conditions.append("(t.year > ? OR (t.year = ? AND t.month >= ?))")
-                params.extend([start_year, start_year, start_month])
-            
-            if end_year and end_month:
-                time_conditions.append("(t.year < ? OR (t.year = ? AND t.month <= ?))")
-                params.extend([end_year, end_year, end_month])
-            
-            time_clause = " AND " + " AND ".join(time_conditions) if time_conditions else ""
-            
-            sql = f"""
-            SELECT 
-                t.id,
-                t.hudm AS 户代码,
-                t.year AS 年份,
-                t.month AS 月份,
-                t.date AS 日期,
-                t.type AS 收支类型,
-                t.code AS 编码,
-                t.type_name AS 项目名称,
-                t.amount AS 数量,
-                t.money AS 金额,
-                t.note AS 备注,
-                t.unit_name AS 单位名称,
-                c.帐目指标名称,
-                c.收支类别,
-                c.单位名称 AS 标准单位名称
-            FROM 调查点台账合并 t
-            LEFT JOIN 调查品种编码 c ON t.code = c.帐目编码
-            WHERE t.hudm = ? {time_clause}
-            ORDER BY t.year, t.month, t.date, t.id
-            """
-            
-            result = self.db.execute_query_safe(sql, params)
-            
-            if not result:
-                return []
-            
+            time_clause, time_params = self._build_time_clause(start_year, start_month, end_year, end_month)
+
             # 转换为字典列表
             columns = ['id', '户代码', '年份', '月份', '日期', '收支类型', '编码', '项目名称', 
                       '数量', '金额', '备注', '单位名称', '帐目指标名称', '收支类别', '标准单位名称']
-            
-            data_list = []
-            for row in result:
-                record = dict(zip(columns, row))
-                # 数据类型转换
-                record['金额'] = float(record['金额']) if record['金额'] is not None else 0.0
-                record['数量'] = float(record['数量']) if record['数量'] is not None else 0.0
-                record['收支类型'] = int(record['收支类型']) if record['收支类型'] is not None else 0
-                data_list.append(record)
-            
-            return data_list
+
+            data_map = {}
+            for chunk in self._chunked(list(dict.fromkeys(household_codes))):
+                sql = f"""
+                SELECT 
+                    t.id,
+                    t.hudm AS 户代码,
+                    t.year AS 年份,
+                    t.month AS 月份,
+                    t.date AS 日期,
+                    t.type AS 收支类型,
+                    t.code AS 编码,
+                    t.type_name AS 项目名称,
+                    t.amount AS 数量,
+                    t.money AS 金额,
+                    t.note AS 备注,
+                    t.unit_name AS 单位名称,
+                    c.帐目指标名称,
+                    c.收支类别,
+                    c.单位名称 AS 标准单位名称
+                FROM 调查点台账合并 t
+                LEFT JOIN 调查品种编码 c ON t.code = c.帐目编码
+                WHERE t.hudm IN ({self._placeholders(chunk)}) {time_clause}
+                ORDER BY t.hudm, t.year, t.month, t.date, t.id
+                """
+
+                # 明细行数可能很大且只遍历一次，分批流式读取，不再 fetchall 整个结果
+                for row in self.db.iter_query(sql, chunk + time_params):
+                    record = dict(zip(columns, row))
+                    # 数据类型转换
+                    record['金额'] = float(record['金额']) if record['金额'] is not None else 0.0
+                    record['数量'] = float(record['数量']) if record['数量'] is not None else 0.0
+                    record['收支类型'] = int(record['收支类型']) if record['收支类型'] is not None else 0
+                    data_map.setdefault(record['户代码'], []).append(record)
+
+            return data_map
             
         except Exception as e:
-            self.logger.error(f"获取户收支数据失败: {household_code}, 错误: {e}")
-            return []
+            self.logger.error(f"批量获取户收支数据失败: {len(household_codes)} 户, 错误: {e}")
+            return {}
+
     
     def get_category_mapping(self) -> Dict[str, Dict]:
         """
@@ -328,64 +381,69 @@ class HouseholdAnalysisDAL:
         Returns:
             月度汇总数据列表
         """
-        try:
-            # 构建时间筛选条件
-            time_conditions = []
-            params = [household_code]
-
-            if start_year and start_month:
-                time_conditions.append("(t.year > ? OR (t.year = ? AND t.month >= ?))")
-                params.extend([start_year, start_year, start_month])
-
-            if end_year and end_month:
-                time_conditions.append("(t.year < ? OR (t.year = ? AND t.month <= ?))")
-                params.extend([end_year, end_year, end_month])
-
-            time_clause = " AND " + " AND ".join(time_conditions) if time_conditions else ""
+        return self.get_households_monthly_summary(
+            [household_code], start_year, start_month, end_year, end_month
+        ).get(household_code, [])
 
-            sql = f"""
-            SELECT
-                t.year AS 年份,
-                t.month AS 月份,
-                COUNT(*) AS 总记账笔数,
-                COUNT(CASE WHEN t.type = 1 THEN 1 END) AS 收入笔数,
-                COUNT(CASE WHEN t.type = 2 THEN 1 END) AS 支出笔数,
-                SUM(CASE WHEN t.type = 1 THEN t.money ELSE 0 END) AS 收入总额,
-                SUM(CASE WHEN t.type = 2 THEN t.money ELSE 0 END) AS 支出总额,
-                COUNT(CASE WHEN t.code IS NULL THEN 1 END) AS 未编码笔数,
-                COUNT(CASE WHEN t.code IS NOT NULL THEN 1 END) AS 已编码笔数,
-                COUNT(DISTINCT t.date) AS 记账天数,
-                MIN(t.date) AS 首次记账日期,
-                MAX(t.date) AS 最后记账日期
-            FROM 调查点台账合并 t
-            WHERE t.hudm = ? {time_clause}
-            GROUP BY t.year, t.month
-            ORDER BY t.year, t.month
-            """
+    def get_households_monthly_summary(self, household_codes: List[str],
+                                     start_year: str = None, start_month: str = None,
+                                     end_year: str = None, end_month: str = None) -> Dict[str, List[Dict]]:
+        """
+        批量获取户月度收支汇总数据
 
-            result = self.db.execute_query_safe(sql, params)
+        Args:
+            household_codes: 户代码列表
+            start_year: 开始年份
+            start_month: 开始月份
+            end_year: 结束年份
+            end_month: 结束月份
 
-            if not result:
-                return []
+        Returns:
+            户代码到月度汇总数据列表的映射（无数据的户不在结果中）
+        """
+        try:
+            time_clause, time_params = self._build_time_clause(start_year, start_month, end_year, end_month)
 
             # 转换为字典列表
             columns = ['年份', '月份', '总记账笔数', '收入笔数', '支出笔数', '收入总额', '支出总额',
                       '未编码笔数', '已编码笔数', '记账天数', '首次记账日期', '最后记账日期']
 
-            data_list = []
-            for row in result:
-                record = dict(zip(columns, row))
-                # 数据类型转换
-                record['收入总额'] = float(record['收入总额']) if record['收入总额'] is not None else 0.0
-                record['支出总额'] = float(record['支出总额']) if record['支出总额'] is not None else 0.0
-                record['收支差额'] = record['收入总额'] - record['支出总额']
-                data_list.append(record)
+            data_map = {}
+            for chunk in self._chunked(list(dict.fromkeys(household_codes))):
+                sql = f"""
+                SELECT
+                    t.hudm,
+                    t.year AS 年份,
+                    t.month AS 月份,
+                    COUNT(*) AS 总记账笔数,
+                    COUNT(CASE WHEN t.type = 1 THEN 1 END) AS 收入笔数,
+                    COUNT(CASE WHEN t.type = 2 THEN 1 END) AS 支出笔数,
+                    SUM(CASE WHEN t.type = 1 THEN t.money ELSE 0 END) AS 收入总额,
+                    SUM(CASE WHEN t.type = 2 THEN t.money ELSE 0 END) AS 支出总额,
+                    COUNT(CASE WHEN t.code IS NULL THEN 1 END) AS 未编码笔数,
+                    COUNT(CASE WHEN t.code IS NOT NULL THEN 1 END) AS 已编码笔数,
+                    COUNT(DISTINCT t.date) AS 记账天数,
+                    MIN(t.date) AS 首次记账日期,
+                    MAX(t.date) AS 最后记账日期
+                FROM 调查点台账合并 t
+                WHERE t.hudm IN ({self._placeholders(chunk)}) {time_clause}
+                GROUP BY t.hudm, t.year, t.month
+                ORDER BY t.hudm, t.year, t.month
+                """
+
+                for row in self.db.execute_query_safe(sql, chunk + time_params):
+                    record = dict(zip(columns, row[1:]))
+                    # 数据类型转换
+                    record['收入总额'] = float(record['收入总额']) if record['收入总额'] is not None else 0.0
+                    record['支出总额'] = float(record['支出总额']) if record['支出总额'] is not None else 0.0
+                    record['收支差额'] = record['收入总额'] - record['支出总额']
+                    data_map.setdefault(row[0], []).append(record)
 
-            return data_list
+            return data_map
 
         except Exception as e:
-            self.logger.error(f"获取户月度汇总数据失败: {household_code}, 错误: {e}")
-            return []
+            self.logger.error(f"批量获取户月度汇总数据失败: {len(household_codes)} 户, 错误: {e}")
+            return {}
 
     def get_household_category_summary(self, household_code: str,
                                      start_year: str = None, start_month: str = None,
@@ -403,61 +461,66 @@ class HouseholdAnalysisDAL:
         Returns:
             分类汇总数据列表
         """
-        try:
-            # 构建时间筛选条件
-            time_conditions = []
-            params = [household_code]
-
-            if start_year and start_month:
-                time_conditions.append("(t.year > ? OR (t.year = ? AND t.month >= ?))")
-                params.extend([start_year, start_year, start_month])
-
-            if end_year and end_month:
-                time_conditions.append("(t.year < ? OR (t.year = ? AND t.month <= ?))")
-                params.extend([end_year, end_year, end_month])
+        return self.get_households_category_summary(
+            [household_code], start_year, start_month, end_year, end_month
+        ).get(household_code, [])
 
-            time_clause = " AND " + " AND ".join(time_conditions) if time_conditions else ""
-
-            sql = f"""
-            SELECT
-                SUBSTR(t.code, 1, 2) AS 编码前缀,
-                t.type AS 收支类型,
-                COUNT(*) AS 记账笔数,
-                SUM(t.money) AS 总金额,
-                AVG(t.money) AS 平均金额,
-                MIN(t.money) AS 最小金额,
-                MAX(t.money) AS 最大金额,
-                COUNT(DISTINCT (t.year || '-' || t.month)) AS 涉及月份数
-            FROM 调查点台账合并 t
-            WHERE t.hudm = ? AND t.code IS NOT NULL {time_clause}
-            GROUP BY SUBSTR(t.code, 1, 2), t.type
-            ORDER BY t.type, SUM(t.money) DESC
-            """
+    def get_households_category_summary(self, household_codes: List[str],
+                                      start_year: str = None, start_month: str = None,
+                                      end_year: str = None, end_month: str = None) -> Dict[str, List[Dict]]:
+        """
+        批量获取户分类汇总数据
 
-            result = self.db.execute_query_safe(sql, params)
+        Args:
+            household_codes: 户代码列表
+            start_year: 开始年份
+            start_month: 开始月份
+            end_year: 结束年份
+            end_month: 结束月份
 
-            if not result:
-                return []
+        Returns:
+            户代码到分类汇总数据列表的映射（无数据的户不在结果中）
+        """
+        try:
+            time_clause, time_params = self._build_time_clause(start_year, start_month, end_year, end_month)
 
             # 转换为字典列表
             columns = ['编码前缀', '收支类型', '记账笔数', '总金额', '平均金额', '最小金额', '最大金额', '涉及月份数']
 
-            data_list = []
-            for row in result:
-                record = dict(zip(columns, row))
-                # 数据类型转换
-                record['总金额'] = float(record['总金额']) if record['总金额'] is not None else 0.0
-                record['平均金额'] = float(record['平均金额']) if record['平均金额'] is not None else 0.0
-                record['最小金额'] = float(record['最小金额']) if record['最小金额'] is not None else 0.0
-                record['最大金额'] = float(record['最大金额']) if record['最大金额'] is not None else 0.0
-                record['主要分类'] = self._get_main_category(record['编码前缀'] + '0000')
-                data_list.append(record)
+            data_map = {}
+            for chunk in self._chunked(list(dict.fromkeys(household_codes))):
+                sql = f"""
+                SELECT
+                    t.hudm,
+                    SUBSTR(t.code, 1, 2) AS 编码前缀,
+                    t.type AS 收支类型,
+                    COUNT(*) AS 记账笔数,
+                    SUM(t.money) AS 总金额,
+                    AVG(t.money) AS 平均金额,
+                    MIN(t.money) AS 最小金额,
+                    MAX(t.money) AS 最大金额,
+                    COUNT(DISTINCT CAST(t.year AS INTEGER) * 100 + CAST(t.month AS INTEGER)) AS 涉及月份数
+                FROM 调查点台账合并 t
+                WHERE t.hudm IN ({self._placeholders(chunk)}) AND t.code IS NOT NULL {time_clause}
+                GROUP BY t.hudm, SUBSTR(t.code, 1, 2), t.type
+                ORDER BY t.hudm, t.type, SUM(t.money) DESC
+                """
+
+                for row in self.db.execute_query_safe(sql, chunk + time_params):
+                    record = dict(zip(columns, row[1:]))
+                    # 数据类型转换
+                    record['总金额'] = float(record['总金额']) if record['总金额'] is not None else 0.0
+                    record['平均金额'] = float(record['平均金额']) if record['平均金额'] is not None else 0.0
+                    record['最小金额'] = float(record['最小金额']) if record['最小金额'] is not None else 0.0
+                    record['最大金额'] = float(record['最大金额']) if record['最大金额'] is not None else 0.0
+                    record['主要分类'] = self._get_main_category(record['编码前缀'] + '0000')
+                    data_map.setdefault(row[0], []).append(record)
 
-            return data_list
+            return data_map
 
         except Exception as e:
-            self.logger.error(f"获取户分类汇总数据失败: {household_code}, 错误: {e}")
-            return []
+            self.logger.error(f"批量获取户分类汇总数据失败: {len(household_codes)} 户, 错误: {e}")
+            return {}
 
     def get_statistical_benchmarks(self, area_type: str = 'all', area_value: str = None) -> Dict:
         """
@@ -5,7 +5,7 @@
 
 from functools import wraps
 from flask import request
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -190,24 +190,51 @@ def validate_file_upload(allowed_extensions: Optional[List[str]] = None):
 
 class ParamValidator:
     """参数验证工具类"""
+
+    YEAR_MIN, YEAR_MAX = 2020, 2030
+    MONTH_MIN, MONTH_MAX = 1, 12
     
     @staticmethod
     def validate_year(year: str) -> bool:
-        """验证年份参数"""
+        """验证年份参数（整数直接做范围判断，字符串再尝试转换）"""
+        if type(year) is int:
+            return ParamValidator.YEAR_MIN <= year <= ParamValidator.YEAR_MAX
         try:
             year_int = int(year)
-            return 2020 <= year_int <= 2030
+            return ParamValidator.YEAR_MIN <= year_int <= ParamValidator.YEAR_MAX
         except (ValueError, TypeError):
             return False
     
     @staticmethod
     def validate_month(month: str) -> bool:
-        """验证月份参数"""
+        """验证月份参数（整数直接做范围判断，字符串再尝试转换）"""
+        if type(month) is int:
+            return ParamValidator.MONTH_MIN <= month <= ParamValidator.MONTH_MAX
         try:
             month_int = int(month)
-            return 1 <= month_int <= 12
+            return ParamValidator.MONTH_MIN <= month_int <= ParamValidator.MONTH_MAX
         except (ValueError, TypeError):
             return False
+
+    @staticmethod
+    def validate_period_params(start_year=None, start_month=None,
+                               end_year=None, end_month=None) -> Optional[str]:
+        """
+        一次性验证开始/结束年月参数
+
+        Returns:
+            第一个不合法参数对应的错误消息；全部合法时返回None
+        """
+        checks = (
+            (start_year, ParamValidator.validate_year, '开始年份格式错误'),
+            (start_month, ParamValidator.validate_month, '开始月份格式错误'),
+            (end_year, ParamValidator.validate_year, '结束年份格式错误'),
+            (end_month, ParamValidator.validate_month, '结束月份格式错误'),
+        )
+        for value, validator, message in checks:
+            if value and not validator(value):
+                return message
+        return None
     
     @staticmethod
     def validate_numeric_string(value: str, min_val: float = None, max_val: float = None) -> bool:
@@ -274,8 +301,10 @@ class ParamValidator:
 class FilterBuilder:
     """筛选条件构建工具类"""
     
-    def __init__(self, table_alias: str = 't'):
+    def __init__(self, table_alias: str = 't', village_column: Optional[str] = None):
         self.table_alias = table_alias
+        # 村代码列表达式：台账明细表按户代码前12位截取，汇总表可直接传入村代码列
+        self.village_column = village_column or f"SUBSTR({table_alias}.hudm, 1, 12)"
         self.conditions = []
         self.params = []
     
@@ -335,20 +364,32 @@ class FilterBuilder:
             self.conditions.append(f"SUBSTR({self.table_alias}.hudm, 1, 9) = ?")
             self.params.append(town_codes[town])
 
+    @staticmethod
+    def town_in_clause(mapping: Dict, town: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """获取乡镇对应的 IN 子句占位符与村代码元组，优先使用映射中预先生成的结果"""
+        if not town or not mapping:
+            return None
+        in_clause = mapping.get('town_to_in_clause', {}).get(town)
+        if in_clause is None:
+            village_codes = mapping.get('town_to_villages', {}).get(town)
+            if not village_codes:
+                return None
+            in_clause = (','.join(['?'] * len(village_codes)), tuple(village_codes))
+        return in_clause
+
     def add_town_filter_with_mapping(self, town: str, mapping: Dict):
         """添加乡镇筛选条件，基于v_town_village_list视图映射"""
-        if town and mapping and town in mapping.get('town_to_villages', {}):
-            village_codes = mapping['town_to_villages'][town]
-            if village_codes:
-                placeholders = ','.join(['?' for _ in village_codes])
-                self.conditions.append(f"SUBSTR({self.table_alias}.hudm, 1, 12) IN ({placeholders})")
-                self.params.extend(village_codes)
+        in_clause = self.town_in_clause(mapping, town)
+        if in_clause:
+            placeholders, village_codes = in_clause
+            self.conditions.append(f"{self.village_column} IN ({placeholders})")
+            self.params.extend(village_codes)
 
     def add_village_filter(self, village_code: str):
         """添加村庄筛选条件，基于村庄代码"""
         if village_code:
             # village_code是从v_town_village_list视图获取的村代码
-            self.conditions.append(f"SUBSTR({self.table_alias}.hudm, 1, 12) = ?")
+            self.conditions.append(f"{self.village_column} = ?")
             self.params.append(village_code)
 
     def add_household_filter(self, household: str):
@@ -395,7 +436,8 @@ class FilterBuilder:
         return builder.build_where_clause(), builder.get_params()
 
     @classmethod
-    def build_from_request_with_mapping(cls, table_alias: str = 't', mapping: Optional[Dict] = None, exclude_town: bool = False):
+    def build_from_request_with_mapping(cls, table_alias: str = 't', mapping: Optional[Dict] = None, exclude_town: bool = False,
+                                        village_column: Optional[str] = None):
         """
         从请求参数构建筛选条件，使用v_town_village_list视图映射
 
@@ -403,11 +445,12 @@ class FilterBuilder:
             table_alias: 表别名
             mapping: 乡镇村庄映射字典
             exclude_town: 是否排除乡镇筛选
+            village_column: 村代码列表达式（默认按 hudm 前12位截取）
 
         Returns:
             WHERE子句和参数元组
         """
-        builder = cls(table_alias)
+        builder = cls(table_alias, village_column)
         params_dict = ParamValidator.get_validated_filter_params()
 
         # 优先使用时间段范围筛选
@@ -4,10 +4,31 @@
 """
 
 import logging
+import threading
 from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# 台账/村名单数据版本号：数据变更时递增，统计接口的结果缓存以此为键的一部分
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+# 台账预聚合汇总表：刷新失败时整体删除，统计接口回退到实时查询
+LEDGER_ROLLUP_TABLES = ('mv_household_stats', 'mv_month_stats')
+
+
+def get_data_version() -> int:
+    """获取当前数据版本号"""
+    return _data_version
+
+
+def bump_data_version() -> int:
+    """递增数据版本号，使基于旧版本的统计缓存全部失效"""
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+        return _data_version
+
 class QueryService:
     """数据库查询服务类，提供统一的查询接口"""
     
@@ -269,11 +290,286 @@ class QueryService:
 
         return []
 
+    def _table_exists(self, table_name: str) -> bool:
+        """检查表是否存在"""
+        result = self.db.execute_query_safe(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [table_name]
+        )
+        return bool(result)
+
+    def _column_exists(self, table_name: str, column_name: str) -> bool:
+        """检查表中是否存在指定列（表不存在时返回False）"""
+        result = self.db.execute_query_safe(
+            "SELECT 1 FROM pragma_table_info(?) WHERE name = ?", [table_name, column_name]
+        )
+        return bool(result)
+
+    def refresh_ledger_rollups(self) -> bool:
+        """
+        重建台账预聚合汇总表
+
+        凡改写台账 hudm/year/month/money/type/code 的写入路径都须在提交后调用：
+        全国数据导入、清空、恢复、手动刷新，以及生成台账前按调查品种编码重算收支类型。
+        只改 note/ybz 的更新不影响汇总结果，无需调用。
+        migrate_mssql_to_sqlite.py 等绕过应用直接改写台账的途径无法在写入后调用：
+        迁移脚本结束时删除汇总表，应用启动时也会重建一次，手工修改台账后需重启应用或手动刷新。
+
+        mv_household_stats 按 户代码+年+月 预先聚合，分户、分乡镇统计只需扫描该表（户数可按 hudm 精确去重）；
+        mv_month_stats 再由其按 村代码+年+月 汇总，分月统计只需扫描该小表，
+        户代码唯一属于一个村，因此各村户数相加即为准确户数。
+        """
+        # 台账已变更：无论汇总表重建是否成功，先让统计结果缓存失效
+        bump_data_version()
+        try:
+            with self.db.pool.get_cursor() as cursor:
+                # 分户汇总表每次整表重建（DDL 在 SQLite 中同样受事务保护），表结构调整后无需额外迁移
+                cursor.execute("DROP TABLE IF EXISTS mv_household_stats")
+                cursor.execute("""
+                CREATE TABLE mv_household_stats (
+                    hudm TEXT,
+                    village_code TEXT,
+                    year TEXT,
+                    month TEXT,
+                    记账笔数 INTEGER,
+                    正金额合计 REAL,
+                    收入笔数 INTEGER,
+                    支出笔数 INTEGER,
+                    收入总额 REAL,
+                    支出总额 REAL,
+                    未编码笔数 INTEGER,
+                    已编码笔数 INTEGER
+                )
+                """)
+                cursor.execute(
+                    "CREATE INDEX IX_mv_household_stats_hudm ON mv_household_stats(hudm, year, month)"
+                )
+                cursor.execute(
+                    "CREATE INDEX IX_mv_household_stats_village ON mv_household_stats(village_code, year, month)"
+                )
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS mv_month_stats (
+                    village_code TEXT,
+                    year TEXT,
+                    month TEXT,
+                    记账笔数 INTEGER,
+                    户数 INTEGER,
+                    收入笔数 INTEGER,
+                    支出笔数 INTEGER,
+                    收入总额 REAL,
+                    支出总额 REAL,
+                    未编码笔数 INTEGER,
+                    已编码笔数 INTEGER
+                )
+                """)
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS IX_mv_month_stats_village ON mv_month_stats(village_code, year, month)"
+                )
+                # 在同一事务内清空并重建，读请求只会看到旧数据或新数据
+                cursor.execute("""
+                INSERT INTO mv_household_stats
+                SELECT
+                    t.hudm,
+                    SUBSTR(t.hudm, 1, 12) AS village_code,
+                    t.year,
+                    t.month,
+                    COUNT(*),
+                    TOTAL(t.money) FILTER (WHERE t.money > 0),
+                    COUNT(*) FILTER (WHERE t.type = 1),
+                    COUNT(*) FILTER (WHERE t.type = 2),
+                    TOTAL(t.money) FILTER (WHERE t.type = 1),
+                    TOTAL(t.money) FILTER (WHERE t.type = 2),
+                    COUNT(*) FILTER (WHERE t.code IS NULL),
+                    COUNT(t.code)
+                FROM 调查点台账合并 t
+                GROUP BY t.hudm, t.year, t.month
+                """)
+                # 分月汇总直接由分户汇总表生成，无需再次扫描台账
+                cursor.execute("DELETE FROM mv_month_stats")
+                cursor.execute("""
+                INSERT INTO mv_month_stats
+                SELECT
+                    s.village_code,
+                    s.year,
+                    s.month,
+                    SUM(s.记账笔数),
+                    COUNT(*),
+                    SUM(s.收入笔数),
+                    SUM(s.支出笔数),
+                    SUM(s.收入总额),
+                    SUM(s.支出总额),
+                    SUM(s.未编码笔数),
+                    SUM(s.已编码笔数)
+                FROM mv_household_stats s
+                GROUP BY s.village_code, s.year, s.month
+                """)
+            self.logger.info("台账预聚合汇总表刷新完成")
+            return True
+        except Exception as e:
+            self.logger.error(f"刷新台账预聚合汇总表失败: {e}")
+            # 事务已回滚，旧汇总表可能与台账不一致：删除后统计接口回退到实时查询，直至下次刷新成功
+            self._drop_ledger_rollups()
+            return False
+
+    def _drop_ledger_rollups(self):
+        """删除台账预聚合汇总表（刷新失败时调用）"""
+        try:
+            with self.db.pool.get_cursor() as cursor:
+                for table in LEDGER_ROLLUP_TABLES:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        except Exception as e:
+            self.logger.error(f"删除台账预聚合汇总表失败: {e}")
+
+    def get_month_statistics_from_rollup(
+        self,
+        where_clause: str = "",
+        params: Optional[List] = None
+    ) -> Optional[List]:
+        """
+        从 mv_month_stats 汇总表获取分月统计
+
+        Args:
+            where_clause: 针对汇总表别名 m 的WHERE子句
+            params: 查询参数
+
+        Returns:
+            与实时查询列顺序一致的结果行；汇总表不存在时返回None，由调用方回退到实时查询
+        """
+        if not self._table_exists('mv_month_stats'):
+            return None
+
+        sql = f"""
+        SELECT
+            m.year, m.month,
+            SUM(m.记账笔数), SUM(m.户数), SUM(m.收入笔数), SUM(m.支出笔数),
+            SUM(m.收入总额), SUM(m.支出总额), SUM(m.未编码笔数)
+        FROM mv_month_stats m
+        {where_clause}
+        GROUP BY m.year, m.month
+        ORDER BY m.year, m.month
+        """
+        return self.db.execute_query_safe(sql, params or [])
+
+    def get_overview_statistics_from_rollup(
+        self,
+        where_clause: str = "",
+        params: Optional[List] = None
+    ) -> Optional[List]:
+        """
+        从 mv_household_stats 汇总表获取总体统计概览（户数、月份数在 户+年月 粒度上去重，结果精确）
+
+        Args:
+            where_clause: 针对汇总表别名 s 的WHERE子句
+            params: 查询参数
+
+        Returns:
+            与实时查询列顺序一致的结果行；汇总表不存在时返回None，由调用方回退到实时查询
+        """
+        # 旧版本汇总表缺少 正金额合计 列，需等下次刷新重建后才能使用
+        if not self._column_exists('mv_household_stats', '正金额合计'):
+            return None
+
+        sql = f"""
+        SELECT
+            TOTAL(s.记账笔数), COUNT(DISTINCT s.hudm),
+            COUNT(DISTINCT CAST(s.year AS INTEGER) * 100 + CAST(s.month AS INTEGER)),
+            TOTAL(s.正金额合计), TOTAL(s.收入总额), TOTAL(s.支出总额), TOTAL(s.未编码笔数)
+        FROM mv_household_stats s
+        {where_clause}
+        """
+        return self.db.execute_query_safe(sql, params or [])
+
+    def get_household_statistics_from_rollup(
+        self,
+        where_clause: str = "",
+        params: Optional[List] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        从 mv_household_stats 汇总表获取分户统计
+
+        Args:
+            where_clause: 针对汇总表别名 s 的WHERE子句
+            params: 查询参数
+
+        Returns:
+            与 get_household_statistics 结构一致的结果；汇总表不存在时返回None，由调用方回退到实时查询
+        """
+        if not self._table_exists('mv_household_stats'):
+            return None
+
+        sql = f"""
+        SELECT
+            s.hudm, h.`户主姓名`, s.year, s.month, s.记账笔数,
+            s.收入笔数, s.支出笔数, s.收入总额, s.支出总额, s.未编码笔数, s.已编码笔数
+        FROM mv_household_stats s LEFT JOIN `调查点户名单` h ON s.hudm = h.`户代码`
+        {where_clause}
+        ORDER BY s.year, s.month, s.hudm
+        """
+
+        columns = ['户代码', '户主姓名', '年份', '月份', '记账笔数', '收入笔数', '支出笔数', '收入总额', '支出总额', '未编码笔数', '已编码笔数']
+        data = self.execute_with_result_mapping(sql, params, columns)
+
+        for row in data:
+            row['收入总额'] = float(row.get('收入总额', 0) or 0)
+            row['支出总额'] = float(row.get('支出总额', 0) or 0)
+
+        return data
+
+    def get_all_town_statistics_from_rollup(
+        self,
+        where_clause: str = "",
+        params: Optional[List] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        从 mv_household_stats 汇总表获取所有乡镇统计（户数按 hudm 去重，跨月不重复计数）
+
+        Args:
+            where_clause: 针对汇总表别名 s 的WHERE子句
+            params: 查询参数
+
+        Returns:
+            与 get_all_town_statistics 结构一致的结果；汇总表不存在时返回None，由调用方回退到实时查询
+        """
+        if not self._table_exists('mv_household_stats'):
+            return None
+
+        sql = f"""
+        SELECT
+            v.所在乡镇街道 as 乡镇名称,
+            TOTAL(s.记账笔数), COUNT(DISTINCT s.hudm),
+            TOTAL(s.收入笔数), TOTAL(s.支出笔数),
+            TOTAL(s.收入总额), TOTAL(s.支出总额),
+            TOTAL(s.未编码笔数), TOTAL(s.已编码笔数)
+        FROM `v_town_village_list` v
+        LEFT JOIN mv_household_stats s ON s.village_code = v.村代码
+        {where_clause}
+        GROUP BY v.所在乡镇街道
+        ORDER BY v.所在乡镇街道
+        """
+
+        result = self.db.execute_query_safe(sql, params or [])
+        return [
+            {
+                '乡镇名称': row[0],
+                '记账笔数': int(row[1] or 0),
+                '户数': row[2] or 0,
+                '收入笔数': int(row[3] or 0),
+                '支出笔数': int(row[4] or 0),
+                '收入总额': float(row[5] or 0),
+                '支出总额': float(row[6] or 0),
+                '未编码笔数': int(row[7] or 0),
+                '已编码笔数': int(row[8] or 0)
+            }
+            for row in (result or [])
+        ]
+
     def refresh_statistics_cache(self):
         """刷新统计缓存表（若缓存表不存在则自动创建）"""
         try:
             self.logger.info("开始刷新统计缓存...")
 
+            if not self.refresh_ledger_rollups():
+                return False
+
             # 1) 确保缓存表存在
             create_town_cache_sql = """
             CREATE TABLE IF NOT EXISTS town_statistics_cache (
@@ -472,7 +768,7 @@ class QueryService:
                 household_name = household_row[1]
 
                 # 查询该户在指定月份的记账统计
-                # 修复：使用CONVERT(VARCHAR(10), t.date, 120)只计算日期部分，避免时间信息干扰
+                # 使用 DATE(t.date) 只计算日期部分，避免时间信息干扰
                 stats_sql = """
                 SELECT
                     COUNT(*) AS `总记账笔数`,
@@ -563,12 +859,11 @@ class QueryService:
 
             # 获取符合条件的户名单
             households_sql = f"""
-            SELECT TOP 50
-                h.户代码,
-                h.户主姓名
-            FROM 调查点户名单 h
+            SELECT h.`户代码`, h.`户主姓名`
+            FROM `调查点户名单` h
             {full_where_clause}
-            ORDER BY h.户代码
+            ORDER BY h.`户代码`
+            LIMIT 50
             """
 
             households_result = self.db.execute_query_safe(households_sql, params or [])
@@ -583,14 +878,14 @@ class QueryService:
                 household_name = household_row[1]
 
                 # 查询该户在时间区间内的记账统计
-                # 修复：使用CONVERT(VARCHAR(10), t.date, 120)只计算日期部分，避免时间信息干扰
+                # 使用 DATE(t.date) 只计算日期部分，避免时间信息干扰
                 stats_sql = """
                 SELECT
-                    COUNT(*) AS 总记账笔数,
-                    COUNT(DISTINCT CONVERT(VARCHAR(10), t.date, 120)) AS 实际记账天数,
-                    MIN(t.date) AS 首次记账日期,
-                    MAX(t.date) AS 最后记账日期
-                FROM 调查点台账合并 t
+                    COUNT(*) AS `总记账笔数`,
+                    COUNT(DISTINCT DATE(t.date)) AS `实际记账天数`,
+                    MIN(t.date) AS `首次记账日期`,
+                    MAX(t.date) AS `最后记账日期`
+                FROM `调查点台账合并` t
                 WHERE t.hudm = ?
                     AND ((t.year > ? OR (t.year = ? AND t.month >= ?))
                     AND (t.year < ? OR (t.year = ? AND t.month <= ?)))
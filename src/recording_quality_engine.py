@@ -237,9 +237,12 @@ class RecordingQualityEngine:
         month_end_ratio = month_end_records / total_records
         
         # 计算分布均匀性（使用变异系数）
-        daily_counts = list(date_distribution.values())
-        if len(daily_counts) > 1:
-            cv = np.std(daily_counts) / np.mean(daily_counts)
+        # 单次遍历求变异系数（σ² = E[x²] - E[x]²），最多31个日计数，不必构造 ndarray
+        days_count = len(date_distribution)
+        if days_count > 1:
+            count_sq = sum(c * c for c in date_distribution.values())
+            mean = total_records / days_count
+            cv = max(count_sq / days_count - mean * mean, 0.0) ** 0.5 / mean
         else:
             cv = 0
         
@@ -9,6 +9,13 @@ import re
 import os
 from functools import wraps
 from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+from openpyxl.styles import NamedStyle
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时回退到标准库 json
+    orjson = None
 
 # 文件上传配置
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
@@ -38,6 +45,29 @@ def sanitize_filename(filename, max_length=200):
     
     return name + ext
 
+def register_named_style(workbook, name, font, alignment, border, fill=None):
+    """
+    在工作簿中登记命名样式，同名样式已存在时直接复用
+
+    各单元格按名称套用同一命名样式，openpyxl 只需为样式对象求哈希、查找索引一次
+
+    Returns:
+        样式名
+    """
+    if name not in workbook.named_styles:
+        style = NamedStyle(name=name, font=font, alignment=alignment, border=border)
+        if fill is not None:
+            style.fill = fill
+        workbook.add_named_style(style)
+    return name
+
+def apply_named_style(cell, style_name):
+    """为单元格套用命名样式，保留单元格自身的数字格式（如日期）"""
+    number_format = cell.number_format
+    cell.style = style_name
+    if number_format != 'General':
+        cell.number_format = number_format
+
 def validate_file_extension(filename, allowed_extensions=None):
     """
     统一的文件扩展名验证函数
@@ -104,3 +134,48 @@ def handle_errors(f):
                 'error': str(e)
             }), 500
     return decorated_function
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    基于 orjson 的 JSON 序列化提供者
+    orjson 以C实现编码，速度远高于标准库；未安装时自动回退到Flask默认实现，输出与原来完全一致。
+    日期、Decimal 等类型仍交给Flask默认的 default 处理，保证输出格式与原来一致。
+
+    与标准库输出的差异（解析后的数据相同的部分不计）：
+    - NaN/Infinity 输出为 null：标准库输出的 NaN/Infinity 不是合法JSON，浏览器 JSON.parse 会直接报错；
+    - 中文等非ASCII字符直接以UTF-8输出，不再转义为 \\uXXXX；
+    - numpy 标量/数组按数值输出（标准库对 numpy.int64 等会抛出 TypeError）；
+    - 非字符串键按 orjson 规则转为字符串（int/float/bool/None 与标准库一致）。
+    orjson 无法编码的对象（如超过64位的整数）回退到标准库编码。
+    """
+
+    def _orjson_option(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _orjson_dumps(self, obj):
+        """使用 orjson 编码；orjson 不支持时返回 None，由调用方回退到标准库"""
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option())
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        body = self._orjson_dumps(obj)
+        if body is None:
+            return super().dumps(obj, **kwargs)
+        return body.decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self._orjson_dumps(obj)
+        if body is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
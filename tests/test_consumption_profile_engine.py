@@ -0,0 +1,139 @@
+"""
+消费习惯画像引擎批量汇总测试
+以逐户直接的 pandas groupby 结果为基准，核对向量化批量汇总与明细关键词掩码。
+"""
+
+import pandas as pd
+import pytest
+
+from src.consumption_profile_engine import (
+    CONSUMPTION_CATEGORIES, OTHER_CONSUMPTION, ConsumptionProfileEngine, _KEYWORD_GROUPS
+)
+
+
+def _category(prefix, type_value, amount):
+    return {'编码前缀': prefix, '收支类型': type_value, '总金额': amount, '项目名称': prefix, '记录数': 1}
+
+
+def _month(income, expense):
+    return {'收入总额': income, '支出总额': expense, '收支差额': income - expense}
+
+
+# 覆盖：收支俱全、只有收入、只有支出（含零/负金额）、支出合计为0、无分类数据；
+# 无月度数据的户既有缺键的（排在中间）也有空列表的
+CATEGORY_SUMMARIES = {
+    'H1': [_category('11', 1, 3000.0), _category('12', 1, 500.0),
+           _category('31', 2, 800.0), _category('35', 2, 200.0), _category('95', 2, 100.0)],
+    'H2': [_category('11', 1, 1200.0), _category('13', 1, 300.0)],
+    'H3': [_category('31', 2, 400.0), _category('33', 2, 0.0), _category('36', 2, -50.0),
+           _category('31', 2, 100.0)],
+    'H5': [_category('31', 2, 50.0), _category('37', 2, -50.0)],
+}
+MONTHLY_SUMMARIES = {
+    'H1': [_month(1000.0, 400.0), _month(1200.0, 1500.0), _month(1300.0, 0.0)],
+    'H3': [],
+    'H4': [_month(0.0, 200.0)],
+    'H5': [_month(50.0, 60.0), _month(70.0, 10.0)],
+}
+
+
+def _reference_aggregates(category_summaries, monthly_summaries):
+    """逐户直接用 pandas groupby 计算的基准结果"""
+    codes = list(dict.fromkeys(list(category_summaries) + list(monthly_summaries)))
+    cat_df = pd.DataFrame(
+        [dict(item, 户代码=code) for code, items in category_summaries.items() for item in items],
+        columns=['户代码', '编码前缀', '收支类型', '总金额']
+    )
+    month_df = pd.DataFrame(
+        [dict(item, 户代码=code) for code, items in monthly_summaries.items() for item in items],
+        columns=['户代码', '收入总额', '支出总额', '收支差额']
+    )
+    monthly = month_df.assign(赤字=month_df['收支差额'] < 0).groupby('户代码').agg(
+        收入总额=('收入总额', 'sum'), 支出总额=('支出总额', 'sum'),
+        赤字月数=('赤字', 'sum'), 月份数=('收入总额', 'size')
+    ).reindex(codes, fill_value=0)
+
+    result = {}
+    for code in codes:
+        household = cat_df[cat_df['户代码'] == code]
+        entry = {}
+        for type_value, ratio_key, total_key in ((2, '支出占比', '支出总额'), (1, '收入占比', '收入总额')):
+            by_prefix = household[household['收支类型'] == type_value].groupby('编码前缀')['总金额'].sum()
+            total = by_prefix.sum()
+            entry[ratio_key] = (by_prefix / total).to_dict() if total > 0 else {}
+            entry[total_key] = float(total)
+
+        expense = household[(household['收支类型'] == 2) & (household['总金额'] > 0)]
+        entry['消费支出'] = expense.groupby(
+            expense['编码前缀'].map(CONSUMPTION_CATEGORIES).fillna(OTHER_CONSUMPTION)
+        )['总金额'].sum().to_dict()
+
+        row = monthly.loc[code]
+        entry['月度汇总'] = {
+            '收入总额': float(row['收入总额']), '支出总额': float(row['支出总额']),
+            '赤字月数': int(row['赤字月数']), '月份数': int(row['月份数'])
+        }
+        result[code] = entry
+    return result
+
+
+@pytest.fixture
+def engine():
+    return ConsumptionProfileEngine(None)
+
+
+def test_batch_aggregates_match_groupby(engine):
+    actual = engine._compute_batch_aggregates(CATEGORY_SUMMARIES, MONTHLY_SUMMARIES)
+    expected = _reference_aggregates(CATEGORY_SUMMARIES, MONTHLY_SUMMARIES)
+
+    assert list(actual) == list(expected)
+    for code, entry in expected.items():
+        assert actual[code]['支出占比'] == pytest.approx(entry['支出占比']), code
+        assert actual[code]['收入占比'] == pytest.approx(entry['收入占比']), code
+        assert actual[code]['支出总额'] == pytest.approx(entry['支出总额']), code
+        assert actual[code]['收入总额'] == pytest.approx(entry['收入总额']), code
+        assert actual[code]['消费支出'] == pytest.approx(entry['消费支出']), code
+        assert actual[code]['月度汇总'] == pytest.approx(entry['月度汇总']), code
+
+
+def test_households_without_months_get_zero_totals(engine):
+    actual = engine._compute_batch_aggregates(CATEGORY_SUMMARIES, MONTHLY_SUMMARIES)
+    empty = {'收入总额': 0.0, '支出总额': 0.0, '赤字月数': 0, '月份数': 0}
+    # H2 缺月度键且夹在有月度数据的户之间，H3 为空列表
+    assert actual['H2']['月度汇总'] == empty
+    assert actual['H3']['月度汇总'] == empty
+    assert actual['H5']['月度汇总'] == {'收入总额': 120.0, '支出总额': 70.0, '赤字月数': 1, '月份数': 2}
+
+
+def test_consumption_sorted_by_amount_descending(engine):
+    actual = engine._compute_batch_aggregates(CATEGORY_SUMMARIES, MONTHLY_SUMMARIES)
+    for entry in actual.values():
+        amounts = list(entry['消费支出'].values())
+        assert amounts == sorted(amounts, reverse=True)
+
+
+def test_empty_input(engine):
+    assert engine._compute_batch_aggregates({}, {}) == {}
+
+
+def test_index_ledger_matches_substring_check(engine):
+    ledger = [
+        {'金额': 120.0, '收支类型': 2, '编码': '3501', '项目名称': '手机话费'},
+        {'金额': 300.0, '收支类型': 2, '编码': '3502', '项目名称': '汽车保险'},
+        {'金额': 80.0, '收支类型': 2, '编码': '3601', '项目名称': '宠物猫粮'},
+        {'金额': 50.0, '收支类型': 1, '编码': '1101', '项目名称': '旅游补贴'},
+        {'金额': 60.0, '收支类型': 2, '编码': '', '项目名称': '电影票'},
+        {'金额': 0.0, '收支类型': 2, '编码': '3401', '项目名称': None},
+        {'金额': 900.0, '收支类型': 2, '编码': '3301', '项目名称': '装修建材及电器'},
+    ]
+    by_prefix, keyword_mask, amounts = engine._index_ledger(ledger)
+
+    assert by_prefix == {'35': [0, 1], '36': [2], '34': [5], '33': [6]}
+    assert amounts.tolist() == [item['金额'] for item in ledger]
+    for i, item in enumerate(ledger):
+        expected = 0
+        if item['收支类型'] == 2 and item['项目名称']:
+            for bit, keywords in _KEYWORD_GROUPS.items():
+                if any(k in item['项目名称'] for k in keywords):
+                    expected |= bit
+        assert int(keyword_mask[i]) == expected, item
@@ -0,0 +1,104 @@
+"""
+OrjsonProvider 输出格式测试
+固定与Flask默认（标准库 json）提供者的异同，防止序列化行为在无意中改变。
+"""
+
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import src.utils as utils
+from src.utils import OrjsonProvider
+
+requires_orjson = pytest.mark.skipif(utils.orjson is None, reason="未安装 orjson")
+
+# 两种提供者解析结果应一致的典型响应数据
+SAMPLE_PAYLOAD = {
+    'success': True,
+    'message': '操作成功',
+    'data': [
+        {'户代码': '321000000001001', '收入总额': 1081.03, '支出笔数': 8, '备注': None},
+        {'户代码': '321000000001002', '收入总额': 0.1 + 0.2, '支出笔数': 0, '备注': ''},
+    ],
+    'date': date(2024, 1, 2),
+    'time': datetime(2024, 1, 2, 3, 4, 5),
+    'amount': Decimal('12.50'),
+    'keys': {1: 'a', 2: 'b'},
+}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    return app
+
+
+@pytest.fixture
+def default_provider():
+    # 提供者只弱引用所属应用，测试期间需保持应用存活
+    default_app = Flask(__name__)
+    yield DefaultJSONProvider(default_app)
+
+
+@requires_orjson
+def test_parsed_output_matches_default_provider(app, default_provider):
+    assert json.loads(app.json.dumps(SAMPLE_PAYLOAD)) == json.loads(default_provider.dumps(SAMPLE_PAYLOAD))
+
+
+@requires_orjson
+def test_response_parsed_output_matches_default_provider(app, default_provider):
+    with app.app_context():
+        body = app.json.response(SAMPLE_PAYLOAD).get_data()
+    assert body.endswith(b"\n")
+    assert json.loads(body) == json.loads(default_provider.dumps(SAMPLE_PAYLOAD))
+
+
+@requires_orjson
+@pytest.mark.parametrize('key', [1, 2.5, True, None])
+def test_non_str_keys_match_default_provider(app, default_provider, key):
+    assert json.loads(app.json.dumps({key: 'v'})) == json.loads(default_provider.dumps({key: 'v'}))
+
+
+@requires_orjson
+def test_non_finite_floats_become_null(app, default_provider):
+    payload = {'nan': math.nan, 'inf': math.inf, 'ninf': -math.inf, 'np_nan': np.float64('nan')}
+    assert json.loads(app.json.dumps(payload)) == {'inf': None, 'nan': None, 'ninf': None, 'np_nan': None}
+    # 标准库输出 NaN/Infinity（非法JSON）
+    assert 'NaN' in default_provider.dumps(payload)
+
+
+@requires_orjson
+def test_non_ascii_written_as_utf8(app, default_provider):
+    assert app.json.dumps({'乡镇名称': '镇A'}) == '{"乡镇名称":"镇A"}'
+    assert default_provider.dumps({'乡镇名称': '镇A'}) == '{"\\u4e61\\u9547\\u540d\\u79f0": "\\u9547A"}'
+
+
+@requires_orjson
+def test_numpy_values_serialized(app):
+    payload = {'count': np.int64(3), 'total': np.float64(1.5), 'values': np.array([1, 2])}
+    assert json.loads(app.json.dumps(payload)) == {'count': 3, 'total': 1.5, 'values': [1, 2]}
+
+
+@requires_orjson
+def test_unsupported_by_orjson_falls_back_to_default(app, default_provider):
+    payload = {'big': 2 ** 70}
+    assert app.json.dumps(payload) == default_provider.dumps(payload)
+    with app.app_context():
+        body = app.json.response(payload).get_data(as_text=True)
+    assert json.loads(body) == payload
+
+
+def test_without_orjson_output_is_identical_to_default(app, default_provider, monkeypatch):
+    monkeypatch.setattr(utils, 'orjson', None)
+    payload = dict(SAMPLE_PAYLOAD, nan=math.nan)
+    assert app.json.dumps(payload) == default_provider.dumps(payload)
+    with app.app_context():
+        body = app.json.response(payload).get_data()
+    assert body == default_provider.response(payload).get_data()